@@ -1,18 +1,48 @@
 import json
 import re
-import google.generativeai as genai  # type: ignore
+import pandas as pd  # type: ignore
+
+from code_index import expansion_predicate, load_default_index
+from context_cache import ContextCacheManager, is_cache_miss
+from fuzzy_index import get_column_index
+from model_backends import DEFAULT_MODEL, GeminiBackend
+from tracing import tracer, record_token_usage
+
+# Stands in for the guideline text when it is supplied through a cached context
+CACHED_GUIDELINE_NOTE = "(The guidelines are provided in the cached context document.)"
 
 class AIService:
-    def __init__(self, app):
+    def __init__(self, app, backend=None):
         self.app = app
+        # Any object with configure(api_key) and generate(prompt, model_name)
+        self.backend = backend or GeminiBackend()
+        # Resolve clear matches with the local fuzzy index before calling the AI
+        self.local_prefilter = True
+        # Expand known medical terms/codes from the offline code table
+        self.code_expansion = True
+        # Upload the guideline text once and refer to it in later requests
+        self.use_context_cache = True
+        self.context_cache = ContextCacheManager()
         
     def configure_api(self, api_key):
-        """Configure the Gemini API with the provided key."""
-        genai.configure(api_key=api_key)
+        """Configure the model backend with the provided key."""
+        self.backend.configure(api_key)
         
-    def extract_json(self, text):
-        """Extract JSON data from text string."""
+    def extract_json(self, text, prefer_object=False):
+        """
+        Extract JSON data from text string.
+
+        Arrays are tried first unless prefer_object is set, which callers
+        expecting a {"matches": [...]} style object must use.
+        """
         try:
+            if prefer_object:
+                match = re.search(r'\{.*\}', text, re.DOTALL)
+                if match:
+                    json_text = match.group(0)
+                    json.loads(json_text)
+                    return json_text
+
             # First attempt: Extract anything between square brackets
             match = re.search(r'\[.*\]', text, re.DOTALL)
             if match:
@@ -40,13 +70,197 @@ class AIService:
         Use AI to determine if rows match the search term semantically,
         not just by string containment.
         """
+        with tracer.span("ai_assisted_filter", rows=len(df)):
+            return self._ai_assisted_filter(df, filter_column, search_term)
+
+    def _ai_assisted_filter(self, df, filter_column, search_term):
+        resolution = self._resolve_locally(df, filter_column, search_term)
+        if resolution["mask"] is not None:
+            return df[resolution["mask"]]
+
         self.app.add_to_status("Using AI to assist with filtering...")
-        
-        # Get a sample of the data to check
-        sample_values = df[filter_column].astype(str).dropna().unique().tolist()
-        if len(sample_values) > 20:  # Limit to 20 unique values for the prompt
-            sample_values = sample_values[:20]
-            
+        matched_values = self._request_matches(filter_column, search_term, resolution["sample_values"])
+        return df[self._mask_from_matches(df[filter_column], search_term, matched_values, resolution)]
+
+    def _resolve_locally(self, df, filter_column, search_term):
+        """
+        Try to match a search term without the AI (code table, then fuzzy index).
+
+        Returns:
+            dict: "mask" (Series, or None if the AI is needed), "confident"
+            (values accepted locally), "expanded" (code table mask or None)
+            and "sample_values" (values to send to the AI)
+        """
+        column = df[filter_column]
+
+        expanded = None
+        if self.code_expansion:
+            with tracer.span("code_expansion") as span:
+                code_index = load_default_index()
+                expansion = code_index.expand(search_term) if code_index else None
+                filter_mask = None
+                if expansion:
+                    filter_mask = self.match_unique_values(
+                        column, expansion_predicate(expansion), lowercase=False
+                    )
+                    span["attributes"]["expanded_terms"] = (
+                        len(expansion["codes"]) + len(expansion["names"]) + len(expansion["acronyms"])
+                    )
+            if filter_mask is not None and filter_mask.any():
+                self.app.add_to_status(
+                    f"Expanded '{search_term}' to {len(expansion['codes'])} codes and "
+                    f"{len(expansion['names']) + len(expansion['acronyms'])} names from the offline code table"
+                )
+                # Keep plain containment of the original term, as the AI path does
+                expanded = filter_mask | self.contains_mask(column, search_term)
+
+        confident, ambiguous = [], []
+        if self.local_prefilter:
+            with tracer.span("fuzzy_prefilter") as span:
+                candidates = get_column_index(df, filter_column).search(search_term)
+                confident = [value for value, _, certain in candidates if certain]
+                ambiguous = [value for value, _, certain in candidates if not certain]
+                span["attributes"].update(confident=len(confident), ambiguous=len(ambiguous))
+
+            if not ambiguous and (confident or expanded is not None):
+                if confident:
+                    self.app.add_to_status(f"Resolved {len(confident)} matching terms for '{search_term}' locally")
+                mask = column.isin(confident)
+                if expanded is not None:
+                    mask |= expanded
+                return {"mask": mask, "confident": confident, "expanded": expanded, "sample_values": []}
+        elif expanded is not None:
+            return {"mask": expanded, "confident": [], "expanded": expanded, "sample_values": []}
+
+        if ambiguous:
+            # Only ask the AI to confirm the uncertain local candidates
+            sample_values = [str(value) for value in ambiguous]
+        else:
+            # Get a sample of the data to check (unique values only, no full-column string copy)
+            sample_values = [str(value) for value in column.unique()]
+            if len(sample_values) > 20:  # Limit to 20 unique values for the prompt
+                sample_values = sample_values[:20]
+        return {"mask": None, "confident": confident, "expanded": expanded, "sample_values": sample_values}
+
+    def _mask_from_matches(self, column, search_term, matched_values, resolution):
+        """Build the row mask from AI matches, falling back to local results."""
+        confident = resolution["confident"]
+        if matched_values is None:
+            if confident:
+                mask = column.isin(confident)
+            else:
+                mask = self.contains_mask(column, search_term)
+        else:
+            # Match on the local and AI terms plus the original search term
+            lowered_matches = [str(match).lower() for match in matched_values + confident]
+            search_lower = search_term.lower()
+            mask = self.match_unique_values(
+                column,
+                lambda x: search_lower in x or any(match in x for match in lowered_matches)
+            )
+
+        if resolution["expanded"] is not None:
+            mask |= resolution["expanded"]
+        return mask
+
+    def resolve_predicates(self, df, predicates):
+        """
+        Build row masks for several (column, term) predicates at once.
+
+        Terms that cannot be resolved locally are sent to the AI together in
+        a single batched request instead of one request per term.
+
+        Args:
+            df: DataFrame to match against
+            predicates: Iterable of (column, term) tuples
+
+        Returns:
+            dict: (column, term) -> boolean mask Series
+        """
+        with tracer.span("resolve_predicates", predicates=len(predicates)):
+            masks = {}
+            pending = []
+            for column_name, term in dict.fromkeys(predicates):
+                if column_name not in df.columns:
+                    raise ValueError(f"Column '{column_name}' not found in the sheet.")
+                resolution = self._resolve_locally(df, column_name, term)
+                if resolution["mask"] is not None:
+                    masks[(column_name, term)] = resolution["mask"]
+                else:
+                    pending.append((column_name, term, resolution))
+
+            if pending:
+                self.app.add_to_status(f"Asking AI about {len(pending)} term(s) in one request...")
+                batch_matches = self._request_batch_matches(
+                    [(column_name, term, resolution["sample_values"]) for column_name, term, resolution in pending]
+                )
+                for position, (column_name, term, resolution) in enumerate(pending):
+                    masks[(column_name, term)] = self._mask_from_matches(
+                        df[column_name], term, batch_matches.get(position), resolution
+                    )
+            return masks
+
+    def _request_batch_matches(self, groups):
+        """
+        Ask the AI about several (column, term, values) groups in one request.
+
+        Returns:
+            dict: group position -> matched values; groups without a usable
+            answer are left out
+        """
+        term_groups = [
+            {"id": position, "column": column_name, "term": term, "values": values}
+            for position, (column_name, term, values) in enumerate(groups)
+        ]
+        batch_prompt = f"""
+        I'm looking for records in a medical database. Each group below gives a search term,
+        the column it applies to, and some values from that column.
+
+        For each group, tell me which values are semantically equivalent to or related to its term.
+        Answer in JSON format as follows:
+
+        {{
+            "results": [
+                {{"id": 0, "matches": ["value1", "value2"]}},
+                ...
+            ],
+            "explanation": "Brief explanation of the matches and equivalences"
+        }}
+
+        Term groups:
+        {json.dumps(term_groups)}
+        """
+
+        try:
+            with tracer.span("generate_content", purpose="batch_filter", groups=len(groups)) as span:
+                response = self.backend.generate(batch_prompt, DEFAULT_MODEL)
+                record_token_usage(span, response)
+
+            with tracer.span("parse_json", purpose="batch_filter"):
+                json_text = self.extract_json(response.text or "", prefer_object=True)
+                data = json.loads(json_text) if json_text else None
+
+            matches = {}
+            if isinstance(data, dict) and isinstance(data.get("results"), list):
+                for result in data["results"]:
+                    if (isinstance(result, dict) and isinstance(result.get("matches"), list)
+                            and result["matches"] and result.get("id") in range(len(groups))):
+                        matches[result["id"]] = result["matches"]
+            if not matches:
+                self.app.add_to_status("Falling back to standard filtering (AI didn't provide useful matches)")
+            return matches
+
+        except Exception as filter_error:
+            self.app.add_to_status(f"AI filtering error: {str(filter_error)}. Falling back to standard filtering.")
+            return {}
+
+    def _request_matches(self, filter_column, search_term, sample_values):
+        """
+        Ask the AI which of the given values match the search term.
+
+        Returns:
+            list: Matched values, or None if the AI gave no usable answer
+        """
         # Create a prompt to check for semantic equivalence
         equivalence_prompt = f"""
         I'm looking for records related to "{search_term}" in a medical database.
@@ -68,14 +282,16 @@ class AIService:
         
         try:
             # Use a smaller, faster model for this filtering task
-            ai_filter_model = genai.GenerativeModel("gemini-1.5-flash")
-            filter_response = ai_filter_model.generate_content(equivalence_prompt)
+            with tracer.span("generate_content", purpose="filter") as span:
+                filter_response = self.backend.generate(equivalence_prompt, DEFAULT_MODEL)
+                record_token_usage(span, filter_response)
             
             if filter_response.text:
                 # Extract the JSON containing matched values
-                match_json_text = self.extract_json(filter_response.text)
-                if match_json_text:
-                    matches_data = json.loads(match_json_text)
+                with tracer.span("parse_json", purpose="filter"):
+                    match_json_text = self.extract_json(filter_response.text, prefer_object=True)
+                    matches_data = json.loads(match_json_text) if match_json_text else None
+                if isinstance(matches_data, dict):
                     
                     # Get the list of matches
                     if "matches" in matches_data and isinstance(matches_data["matches"], list):
@@ -85,33 +301,116 @@ class AIService:
                             self.app.add_to_status(f"AI found {len(matched_values)} related terms to '{search_term}'")
                             if "explanation" in matches_data:
                                 self.app.add_to_status(f"AI explanation: {matches_data['explanation']}")
-                            
-                            # Create the filter based on these values
-                            filter_mask = df[filter_column].astype(str).apply(
-                                lambda x: any(match.lower() in x.lower() for match in matched_values)
-                            )
-                            
-                            # Also include the original search term
-                            filter_mask = filter_mask | df[filter_column].astype(str).str.contains(
-                                search_term, case=False, na=False
-                            )
-                            
-                            return df[filter_mask]
+                            return matched_values
                         
             # Fallback to traditional filtering if AI doesn't provide useful results
             self.app.add_to_status("Falling back to standard filtering (AI didn't provide useful matches)")
-            return df[df[filter_column].astype(str).str.contains(search_term, case=False, na=False)]
+            return None
                     
         except Exception as filter_error:
             self.app.add_to_status(f"AI filtering error: {str(filter_error)}. Falling back to standard filtering.")
-            return df[df[filter_column].astype(str).str.contains(search_term, case=False, na=False)]
+            return None
+
+    @staticmethod
+    def match_unique_values(column, predicate, lowercase=True):
+        """
+        Build a row mask by evaluating a predicate once per distinct value.
+
+        Args:
+            column: Series to match against (categorical or plain)
+            predicate: Function taking a string value and returning bool
+            lowercase: Lower-case values before passing them to the predicate
+
+        Returns:
+            Series: Boolean mask aligned with the column
+        """
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            values = column.cat.categories
+        else:
+            values = column.dropna().unique()
+        matched = [
+            value for value in values
+            if predicate(str(value).lower() if lowercase else str(value))
+        ]
+        return column.isin(matched)
+
+    @classmethod
+    def contains_mask(cls, column, search_term):
+        """Case-insensitive substring match of the search term against a column."""
+        search_lower = search_term.lower()
+        return cls.match_unique_values(column, lambda x: search_lower in x)
             
     def analyze_data(self, search_term, filter_column, pdf_text, data_text):
         """Send data to AI for analysis and process the response."""
         # Prepare the AI prompt
         self.app.add_to_status("Preparing AI analysis...")
         
-        prompt = f"""
+        cached_context = None
+        if self.use_context_cache:
+            with tracer.span("context_cache") as span:
+                cached_context = self.context_cache.get(self.backend, DEFAULT_MODEL, pdf_text)
+                span["attributes"]["cached"] = cached_context is not None
+
+        with tracer.span("build_prompt", guideline_chars=len(pdf_text), data_chars=len(data_text)):
+            prompt = self._build_analysis_prompt(
+                search_term, filter_column, CACHED_GUIDELINE_NOTE if cached_context else pdf_text, data_text
+            )
+
+        # Send to Gemini AI
+        self.app.add_to_status("Sending request to Gemini AI...")
+        try:
+            try:
+                with tracer.span("generate_content", purpose="analysis", cached=cached_context is not None) as span:
+                    response = self._generate(prompt, cached_context)
+                    record_token_usage(span, response)
+            except Exception as generate_error:
+                # Rate limits and transient errors must not double the input by resending the guideline
+                if cached_context is None or not is_cache_miss(generate_error):
+                    raise
+                # The cached context was evicted or has expired; resend the guideline text inline
+                self.context_cache.invalidate(cached_context)
+                prompt = self._build_analysis_prompt(search_term, filter_column, pdf_text, data_text)
+                with tracer.span("generate_content", purpose="analysis", cached=False) as span:
+                    response = self._generate(prompt)
+                    record_token_usage(span, response)
+            
+            if not hasattr(response, 'text') or not response.text:
+                raise ValueError("Empty response from AI")
+                
+            self.app.add_to_status("Processing AI response...")
+            with tracer.span("parse_json", purpose="analysis"):
+                json_text = self.extract_json(response.text)
+                if not json_text:
+                    raise ValueError("No valid JSON found in AI response.")
+
+                response_json = json.loads(json_text)
+
+            # Standardize boolean values
+            for item in response_json:
+                if "Meets Guidelines" in item:
+                    if isinstance(item["Meets Guidelines"], str):
+                        value = item["Meets Guidelines"].lower().strip()
+                        # Set to True if exactly "true", otherwise False
+                        item["Meets Guidelines"] = (value == "true")
+                else:
+                    # Default to False if missing
+                    item["Meets Guidelines"] = False
+                    
+            return response_json
+            
+        except Exception as api_error:
+            self.app.add_to_status(f"AI API Error: {str(api_error)}")
+            return None
+
+    def _generate(self, prompt, cached_context=None):
+        """Send a prompt to the backend, referring to a cached context if given."""
+        if cached_context is None:
+            return self.backend.generate(prompt, DEFAULT_MODEL)
+        return self.backend.generate(prompt, DEFAULT_MODEL, cached_context=cached_context)
+
+    def _build_analysis_prompt(self, search_term, filter_column, pdf_text, data_text):
+        """Build the analysis prompt from the guideline text and filtered data."""
+        return f"""
         Analyze the following filtered data related to '{search_term}' in the {filter_column} column and provide insights based on the guidelines.
 
         {pdf_text}
@@ -147,37 +446,3 @@ class AIService:
 
         Ensure accuracy in extracting and formatting the response while maintaining data integrity.
         """
-
-        # Send to Gemini AI
-        self.app.add_to_status("Sending request to Gemini AI...")
-        try:
-            model = genai.GenerativeModel("gemini-1.5-flash") 
-            response = model.generate_content(prompt)
-            
-            if not hasattr(response, 'text') or not response.text:
-                raise ValueError("Empty response from AI")
-                
-            self.app.add_to_status("Processing AI response...")
-            json_text = self.extract_json(response.text)
-            if not json_text:
-                raise ValueError("No valid JSON found in AI response.")
-
-            response_json = json.loads(json_text)
-
-            # Standardize boolean values
-            for item in response_json:
-                if "Meets Guidelines" in item:
-                    if isinstance(item["Meets Guidelines"], str):
-                        value = item["Meets Guidelines"].lower().strip()
-                        # Set to True if exactly "true", otherwise False
-                        item["Meets Guidelines"] = (value == "true")
-                else:
-                    # Default to False if missing
-                    item["Meets Guidelines"] = False
-                    
-            return response_json
-            
-        except Exception as api_error:
-            self.app.add_to_status(f"AI API Error: {str(api_error)}")
-            return None
-        
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+Batch processing for the AI Medical Data Analyzer Application.
+
+Processes many sheets across many workbooks at once: sheets are parsed in a
+process pool, AI calls go through one concurrency-limited backend shared by
+a thread pool, and all results are merged into one consolidated output.
+
+Usage:
+    python batch.py intake/*.xlsx --pdf guidelines.pdf --column DiseaseName \\
+        --term diabetes --output month_analyzed.xlsx
+"""
+
+import argparse
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd  # type: ignore
+
+from ai_service import AIService
+from file_utils import read_excel_file, read_pdf_file, read_sheet_names, write_excel_file, write_json_file
+from model_backends import ConcurrencyLimitedBackend, create_backend
+from pipeline import HeadlessApp, analyze_dataframe
+from tracing import tracer
+
+
+# Columns added to the consolidated output to show where each record came from
+SOURCE_FILE_COLUMN = "Source File"
+SOURCE_SHEET_COLUMN = "Source Sheet"
+
+
+class QueuedStatus:
+    """Thread-safe status sink; messages are forwarded by the coordinating thread."""
+
+    def __init__(self):
+        self.messages = queue.Queue()
+
+    def add_to_status(self, message):
+        """Queue a status message."""
+        self.messages.put(message)
+
+    def drain(self, status):
+        """Forward queued messages to another object with add_to_status."""
+        while True:
+            try:
+                status.add_to_status(self.messages.get_nowait())
+            except queue.Empty:
+                return
+
+
+def list_jobs(workbook_paths, sheet_names=None):
+    """
+    Expand workbooks into (path, sheet, error) jobs.
+
+    Args:
+        workbook_paths: Excel files to process
+        sheet_names: Sheets to take from each workbook; None means every sheet
+
+    Returns:
+        list: (workbook_path, sheet_name, None) tuples, plus one
+        (workbook_path, None, error message) entry per workbook that
+        could not be opened
+    """
+    jobs = []
+    for path in workbook_paths:
+        if sheet_names:
+            jobs.extend((path, sheet, None) for sheet in sheet_names)
+            continue
+        sheets, error = read_sheet_names(path)
+        if error:
+            jobs.append((path, None, error))
+        else:
+            jobs.extend((path, sheet, None) for sheet in sheets)
+    return jobs
+
+
+def parse_sheet(path, sheet):
+    """
+    Read one sheet in a parse worker process.
+
+    Spans recorded in the worker stay in its own tracer, so they are handed
+    back with the frame for the parent to merge.
+
+    Returns:
+        tuple: (dataframe or None, error message or None, spans, trace_start)
+    """
+    # Drop spans inherited from the parent or left behind by earlier jobs
+    tracer.take_spans()
+    df, error = read_excel_file(path, sheet)
+    return df, error, tracer.take_spans(), tracer.trace_start
+
+
+def run_batch(jobs, filter_column, search_term, pdf_file_path, backend, status,
+              parse_workers=None, max_concurrent_ai=4):
+    """
+    Run the analysis for every job and merge the results.
+
+    Args:
+        jobs: (workbook_path, sheet_name, error) tuples from list_jobs
+        filter_column: Column to filter by
+        search_term: Term to search for
+        pdf_file_path: Guideline PDF shared by all jobs
+        backend: Model backend; wrapped so at most max_concurrent_ai calls run at once
+        status: Object with add_to_status, called from this thread only
+        parse_workers: Processes used for parsing (default: CPU count)
+        max_concurrent_ai: Concurrent AI requests across all jobs
+
+    Returns:
+        tuple: (merged DataFrame or None, list of per-job error messages)
+    """
+    pdf_text, error = read_pdf_file(pdf_file_path)
+    if error:
+        return None, [f"Error reading PDF: {error}"]
+
+    queued_status = QueuedStatus()
+    ai_service = AIService(queued_status, backend=ConcurrencyLimitedBackend(backend, max_concurrent_ai))
+
+    results = []
+    errors = []
+    for path, _, error in jobs:
+        if error:
+            errors.append(f"{os.path.basename(path)}: {error}")
+            status.add_to_status(f"{os.path.basename(path)}: {error}")
+    jobs = [(path, sheet) for path, sheet, error in jobs if not error]
+    status.add_to_status(f"Processing {len(jobs)} sheet(s)...")
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=max_concurrent_ai) as ai_pool:
+        parsing = {parse_pool.submit(parse_sheet, path, sheet): (path, sheet) for path, sheet in jobs}
+        analyzing = {}
+
+        while parsing or analyzing:
+            done, _ = wait(list(parsing) + list(analyzing), timeout=0.2, return_when=FIRST_COMPLETED)
+            queued_status.drain(status)
+
+            for future in done:
+                if future in parsing:
+                    path, sheet = parsing.pop(future)
+                    label = f"{os.path.basename(path)} [{sheet}]"
+                    try:
+                        df, error, spans, trace_start = future.result()
+                        tracer.merge_spans(spans, trace_start)
+                    except Exception as e:
+                        df, error = None, str(e)
+                    if error:
+                        errors.append(f"{label}: {error}")
+                        status.add_to_status(f"{label}: {error}")
+                        continue
+                    status.add_to_status(f"{label}: parsed {len(df)} rows")
+                    analyzing[ai_pool.submit(
+                        analyze_dataframe, ai_service, df, filter_column, search_term, pdf_text
+                    )] = (path, sheet)
+                else:
+                    path, sheet = analyzing.pop(future)
+                    label = f"{os.path.basename(path)} [{sheet}]"
+                    try:
+                        response_df, error = future.result()
+                    except Exception as e:
+                        response_df, error = None, str(e)
+                    if error:
+                        errors.append(f"{label}: {error}")
+                        status.add_to_status(f"{label}: {error}")
+                        continue
+                    response_df.insert(0, SOURCE_SHEET_COLUMN, sheet)
+                    response_df.insert(0, SOURCE_FILE_COLUMN, os.path.basename(path))
+                    results.append(response_df)
+                    status.add_to_status(f"{label}: {len(response_df)} records analyzed")
+
+    queued_status.drain(status)
+    if not results:
+        return None, errors
+    return pd.concat(results, ignore_index=True), errors
+
+
+def save_batch_results(merged_df, output_excel_path):
+    """
+    Write the consolidated batch output as Excel plus a JSON file alongside.
+
+    Returns:
+        tuple: (excel_path, json_path)
+    """
+    output_json_path = os.path.splitext(output_excel_path)[0] + ".json"
+    write_excel_file(merged_df, output_excel_path, "Batch_Analyzed")
+    write_json_file(merged_df.to_dict(orient="records"), output_json_path)
+    return output_excel_path, output_json_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many workbooks/sheets in parallel")
+    parser.add_argument("workbooks", nargs="+")
+    parser.add_argument("--pdf", required=True, help="Guideline PDF")
+    parser.add_argument("--column", required=True, help="Column to filter by")
+    parser.add_argument("--term", required=True, help="Search term")
+    parser.add_argument("--sheets", nargs="*", help="Sheets to process (default: all)")
+    parser.add_argument("--output", required=True, help="Consolidated .xlsx output path")
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--max-concurrent-ai", type=int, default=4)
+    parser.add_argument("--mock", action="store_true", help="Use the local mock backend instead of Gemini")
+    args = parser.parse_args()
+
+    backend = create_backend(args.mock)
+
+    status = HeadlessApp(echo=True)
+    started = time.perf_counter()
+    merged_df, errors = run_batch(
+        list_jobs(args.workbooks, args.sheets), args.column, args.term.lower(), args.pdf, backend, status,
+        parse_workers=args.parse_workers, max_concurrent_ai=args.max_concurrent_ai,
+    )
+    if merged_df is None:
+        raise SystemExit("No results produced.")
+
+    excel_path, json_path = save_batch_results(merged_df, args.output)
+    print(f"Saved {len(merged_df)} records to {excel_path} and {json_path} "
+          f"in {time.perf_counter() - started:.1f}s ({len(errors)} sheet(s) with issues)")
+    for line in tracer.summary():
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Benchmark harness for the AI Medical Data Analyzer Application.
+
+Runs the headless pipeline against the local MockGeminiBackend so results
+are reproducible and need no API key or network access.
+
+Usage:
+    python benchmark.py e2e --runs 20 --rows 2000 --latency 0.2 --tps 400
+    python benchmark.py io --compare
+    python benchmark.py io --sizes 1000 10000 100000 --save-baseline --baseline big.json
+    python benchmark.py startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ai_service import AIService
+from file_utils import read_excel_file, read_pdf_file, write_excel_file, write_json_file
+from model_backends import MockGeminiBackend
+from pipeline import HeadlessApp, run_analysis
+from synthetic_data import write_guideline_pdf, write_workbook
+from tracing import tracer
+
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_BASELINE = os.path.normpath(os.path.join(SRC_DIR, "..", "benchmarks", "io_baseline.json"))
+
+# Growth below these amounts is measurement noise, whatever the relative
+# change (a 30 KB peak going to 40 KB is not a regression)
+MIN_PEAK_GROWTH_BYTES = 1_000_000
+MIN_TIME_GROWTH_SECONDS = 0.01
+
+# Run in a fresh interpreter: time until the window has been drawn and
+# accepts input, then until the background warm-up has finished
+STARTUP_PROBE = """
+import json, time
+started = time.perf_counter()
+from main import create_app
+root, app = create_app()
+root.update()
+usable = time.perf_counter() - started
+while not app._services_ready.is_set():
+    root.update()
+    time.sleep(0.005)
+print(json.dumps({"usable": usable, "warm": time.perf_counter() - started}))
+root.destroy()
+"""
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile (0-100) of a list using linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize_latencies(latencies, elapsed):
+    """
+    Build the standard latency report for a set of runs.
+
+    Args:
+        latencies: Per-run wall times in seconds
+        elapsed: Total wall time of the whole benchmark
+
+    Returns:
+        dict: runs, throughput (runs/s), mean, p50 and p95 in seconds
+    """
+    return {
+        "runs": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "mean": statistics.mean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+    }
+
+
+def _write_fixtures(directory, rows, pages=2):
+    """Write a synthetic workbook and guideline PDF into a directory."""
+    excel_path = os.path.join(directory, f"bench_{rows}.xlsx")
+    pdf_path = os.path.join(directory, f"bench_{pages}.pdf")
+    write_workbook(excel_path, rows)
+    write_guideline_pdf(pdf_path, pages)
+    return excel_path, pdf_path
+
+
+def measure(func, *args, repeats=1, **kwargs):
+    """
+    Time a function untraced over several repeats, then call it once more
+    under tracemalloc for peak allocated memory (tracing slows the call
+    down too much to time it in the same pass).
+
+    Returns:
+        tuple: (result, median seconds, peak_bytes)
+    """
+    timings = []
+    for _ in range(max(1, repeats)):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - started)
+    seconds = statistics.median(timings)
+
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_e2e(args):
+    """Run the end-to-end benchmark and return its report."""
+    backend = MockGeminiBackend(
+        latency=args.latency,
+        tokens_per_second=args.tps,
+        rate_limit_rate=args.rate_limit_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+        prefill_tokens_per_second=args.prefill_tps,
+    )
+    ai_service = AIService(HeadlessApp(), backend=backend)
+    ai_service.use_context_cache = not args.no_context_cache
+
+    latencies = []
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        excel_path, pdf_path = _write_fixtures(directory, args.rows, args.pages)
+        tracer.reset()
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            run_started = time.perf_counter()
+            _, error = run_analysis(ai_service, excel_path, "Sheet1", "DiseaseName", args.search_term, pdf_path)
+            latencies.append(time.perf_counter() - run_started)
+            if error:
+                failures += 1
+        elapsed = time.perf_counter() - started
+
+    report = summarize_latencies(latencies, elapsed)
+    report["failures"] = failures
+    report["stages"] = tracer.stage_totals()
+    return report
+
+
+def run_io(args):
+    """
+    Run the I/O and filtering micro-benchmarks across workbook sizes.
+
+    Returns:
+        dict: "<function>@<rows>" -> {"seconds" (median of args.repeats), "peak_bytes"}
+    """
+    ai_service = AIService(HeadlessApp(), backend=MockGeminiBackend())
+    results = {}
+
+    def record(name, rows, func, *func_args):
+        result, seconds, peak = measure(func, *func_args, repeats=args.repeats)
+        results[f"{name}@{rows}"] = {"seconds": round(seconds, 4), "peak_bytes": peak}
+        print(f"{name:<20} rows={rows:<9} {seconds:8.3f}s  peak {peak / 1e6:8.1f} MB")
+        return result
+
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.sizes:
+            pages = max(1, rows // args.rows_per_page)
+            excel_path, pdf_path = _write_fixtures(directory, rows, pages)
+
+            df, error = record("read_excel_file", rows, read_excel_file, excel_path, "Sheet1", True, args.engine)
+            if error:
+                raise RuntimeError(error)
+            record("read_pdf_file", rows, read_pdf_file, pdf_path)
+            record("ai_assisted_filter", rows, ai_service.ai_assisted_filter, df, "DiseaseName", "diabetes")
+
+            records = df.astype(str).to_dict(orient="records")
+            record("save_to_json", rows, write_json_file, records, os.path.join(directory, "out.json"))
+            record("save_to_excel", rows, write_excel_file, df, os.path.join(directory, "out.xlsx"), "Results")
+    return results
+
+
+def import_breakdown(modules, limit=10):
+    """
+    Import modules in a fresh interpreter under -X importtime.
+
+    Args:
+        modules: Module names to import, in order
+        limit: Number of slowest imports to return
+
+    Returns:
+        dict: "seconds" (total cumulative import time), "slowest" (list of
+        (module, seconds) by cumulative time) and "error" (stderr tail or None)
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=SRC_DIR, capture_output=True, text=True,
+    )
+    timings = []
+    top_level = 0
+    other_lines = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            other_lines.append(line)
+            continue
+        _, cumulative, name = line.split("|", 2)
+        seconds = int(cumulative) / 1e6
+        timings.append((name.strip(), seconds))
+        if not name[1:].startswith(" "):
+            top_level += seconds
+
+    error = "\n".join(other_lines[-3:]) if completed.returncode else None
+    return {
+        "seconds": top_level,
+        "slowest": sorted(timings, key=lambda item: item[1], reverse=True)[:limit],
+        "error": error,
+    }
+
+
+def run_startup(args):
+    """
+    Measure cold start: import costs on and off the startup path, and the
+    time until the window is usable (needs a display).
+
+    Returns:
+        dict: "startup_imports", "deferred_imports" and, when the window
+        could be created, "usable"/"warm" latency reports
+    """
+    # Deferred here: the warm-up list plus the modules the AI service pulls in
+    from gui import WARMUP_MODULES
+
+    report = {
+        "startup_imports": import_breakdown(["main"], args.top),
+        "deferred_imports": import_breakdown(["ai_service", *WARMUP_MODULES, "google.generativeai"], args.top),
+    }
+
+    usable = []
+    warm = []
+    for _ in range(args.runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE], cwd=SRC_DIR, capture_output=True, text=True
+        )
+        if completed.returncode:
+            report["window_error"] = completed.stderr.strip().splitlines()[-1]
+            break
+        times = json.loads(completed.stdout.strip().splitlines()[-1])
+        usable.append(times["usable"])
+        warm.append(times["warm"])
+
+    if usable:
+        report["usable"] = summarize_latencies(usable, sum(usable))
+        report["warm"] = summarize_latencies(warm, sum(warm))
+    return report
+
+
+def compare_to_baseline(results, baseline, tolerance, time_tolerance=1.0):
+    """
+    Compare micro-benchmark results against a stored baseline.
+
+    Peak memory is deterministic enough to gate tightly; wall times vary
+    between machines and runs, so they only fail on a large slowdown.
+    Growth under MIN_PEAK_GROWTH_BYTES / MIN_TIME_GROWTH_SECONDS is ignored.
+
+    Args:
+        results: Output of run_io
+        baseline: Previously saved output of run_io
+        tolerance: Allowed peak memory growth as a fraction (0.25 = 25%)
+        time_tolerance: Allowed slowdown of the median time as a fraction
+
+    Returns:
+        list: Lines describing each regression; empty when none
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric, allowed, floor in (("peak_bytes", tolerance, MIN_PEAK_GROWTH_BYTES),
+                                       ("seconds", time_tolerance, MIN_TIME_GROWTH_SECONDS)):
+            if metric not in previous:
+                continue
+            limit = max(previous[metric] * (1 + allowed), previous[metric] + floor)
+            if current[metric] > limit:
+                regressions.append(f"{key} {metric}: {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the AI Medical Data Analyzer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    e2e = subparsers.add_parser("e2e", help="End-to-end pipeline runs against the mock backend")
+    e2e.add_argument("--runs", type=int, default=10)
+    e2e.add_argument("--rows", type=int, default=1000)
+    e2e.add_argument("--search-term", default="diabetes")
+    e2e.add_argument("--latency", type=float, default=0.0, help="Mock time to first token (s)")
+    e2e.add_argument("--tps", type=float, default=0.0, help="Mock output tokens per second")
+    e2e.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    e2e.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of malformed responses")
+    e2e.add_argument("--seed", type=int, default=0)
+    e2e.add_argument("--pages", type=int, default=2, help="Guideline PDF pages")
+    e2e.add_argument("--prefill-tps", type=float, default=0.0, help="Mock input tokens processed per second")
+    e2e.add_argument("--no-context-cache", action="store_true", help="Always send the guideline text inline")
+    e2e.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    io_bench = subparsers.add_parser("io", help="File I/O and filtering micro-benchmarks")
+    io_bench.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    io_bench.add_argument("--rows-per-page", type=int, default=100, help="Workbook rows per guideline PDF page")
+    io_bench.add_argument("--engine", default="auto", help="Excel engine: auto, openpyxl or calamine")
+    io_bench.add_argument("--baseline", default=DEFAULT_BASELINE)
+    io_bench.add_argument("--save-baseline", action="store_true")
+    io_bench.add_argument("--compare", action="store_true")
+    io_bench.add_argument("--repeats", type=int, default=5, help="Timed repeats per measurement (median is kept)")
+    io_bench.add_argument("--tolerance", type=float, default=0.25, help="Allowed peak memory growth")
+    io_bench.add_argument("--time-tolerance", type=float, default=1.0, help="Allowed slowdown of median times")
+
+    startup = subparsers.add_parser("startup", help="Cold start time and import-time breakdown")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    startup.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    args = parser.parse_args()
+    if args.command == "e2e":
+        report = run_e2e(args)
+        if args.json:
+            print(json.dumps(report, indent=4))
+        else:
+            print(f"runs: {report['runs']} (failures: {report['failures']})")
+            print(f"throughput: {report['throughput']:.2f} runs/s")
+            print(f"latency mean/p50/p95: {report['mean']:.3f}s / {report['p50']:.3f}s / {report['p95']:.3f}s")
+            for line in tracer.summary():
+                print(line)
+    elif args.command == "io":
+        results = run_io(args)
+        if args.save_baseline:
+            os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+            with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+                json.dump(results, baseline_file, indent=4)
+                baseline_file.write("\n")
+            print(f"Baseline saved to {args.baseline}")
+        if args.compare:
+            with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = compare_to_baseline(results, baseline, args.tolerance, args.time_tolerance)
+            for line in regressions:
+                print(f"REGRESSION {line}")
+            if regressions:
+                raise SystemExit(1)
+            print("No regressions against baseline.")
+    elif args.command == "startup":
+        report = run_startup(args)
+        if args.json:
+            print(json.dumps(report, indent=4))
+            return
+        for key, title in (("startup_imports", "Imports before first paint"),
+                           ("deferred_imports", "Imports deferred to the warm-up")):
+            breakdown = report[key]
+            print(f"{title}: {breakdown['seconds'] * 1000:.0f} ms")
+            for name, seconds in breakdown["slowest"]:
+                print(f"    {seconds * 1000:8.1f} ms  {name}")
+            if breakdown["error"]:
+                print(f"    (import failed: {breakdown['error'].splitlines()[-1]})")
+        if "usable" in report:
+            print(f"window usable p50/p95: {report['usable']['p50'] * 1000:.0f} ms / {report['usable']['p95'] * 1000:.0f} ms")
+            print(f"warm-up done p50/p95: {report['warm']['p50'] * 1000:.0f} ms / {report['warm']['p95'] * 1000:.0f} ms")
+        else:
+            print(f"window not measured: {report.get('window_error')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Offline medical code and synonym expansion for the AI Medical Data Analyzer Application.
+
+A CSV table of ICD-style codes (code, parent, name, synonyms) is compiled
+into a compact binary index that is memory-mapped and binary-searched, so
+a search term like "T2DM" or "E11" expands to every equivalent code and
+name without an AI call.
+
+Usage:
+    python code_index.py compile ../data/medical_codes.csv ../data/medical_codes.idx
+    python code_index.py expand "type 2 diabetes"
+"""
+
+import argparse
+import csv
+import hashlib
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from collections import defaultdict
+
+from fuzzy_index import normalize
+
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+DEFAULT_SOURCE = os.path.join(DATA_DIR, "medical_codes.csv")
+
+# Compiled indexes live in a per-user cache, never in the source tree
+CACHE_DIR = os.environ.get("ANALYZER_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "ai-medical-data-analyzer"
+)
+
+MAGIC = b"MCX2"
+HEADER = struct.Struct("<4sI")       # magic, number of keys
+RECORD = struct.Struct("<IIII")      # key offset, key length, group offset, group length
+
+CODE_PREFIX = "C"
+NAME_PREFIX = "N"
+ACRONYM_PREFIX = "A"
+
+
+def is_acronym(name):
+    """Return True for all-capital abbreviations such as "COPD" or "T2DM"."""
+    return re.fullmatch(r"[A-Z][A-Z0-9]*", name) is not None
+
+
+def _code_key(code):
+    return code.strip().lower()
+
+
+def _read_concepts(source_path):
+    """Read the CSV table into {code: {"parent", "names"}}."""
+    concepts = {}
+    with open(source_path, "r", encoding="utf-8", newline="") as source_file:
+        for row in csv.DictReader(source_file):
+            code = row["code"].strip()
+            names = [row["name"].strip()]
+            names += [synonym.strip() for synonym in (row.get("synonyms") or "").split("|") if synonym.strip()]
+            concepts[code] = {"parent": (row.get("parent") or "").strip(), "names": names}
+    return concepts
+
+
+def _expansions(concepts):
+    """Map every concept code to the codes and names of itself and its descendants."""
+    children = defaultdict(list)
+    for code, concept in concepts.items():
+        if concept["parent"]:
+            children[concept["parent"]].append(code)
+
+    expansions = {}
+
+    def expand(code):
+        if code not in expansions:
+            entries = [CODE_PREFIX + code] + [
+                (ACRONYM_PREFIX if is_acronym(name) else NAME_PREFIX) + name
+                for name in concepts[code]["names"]
+            ]
+            for child in sorted(children[code]):
+                entries += [entry for entry in expand(child) if entry not in entries]
+            expansions[code] = entries
+        return expansions[code]
+
+    for code in concepts:
+        expand(code)
+    return expansions
+
+
+def compile_index(source_path, index_path):
+    """
+    Compile a code table CSV into the binary index format.
+
+    The file is written under a temporary name and renamed into place, so
+    other processes never map a partially written index.
+
+    Args:
+        source_path: CSV with code, parent, name and |-separated synonyms columns
+        index_path: Destination index file
+
+    Returns:
+        int: Number of lookup keys written
+    """
+    concepts = _read_concepts(source_path)
+    expansions = _expansions(concepts)
+
+    # Every code, name and synonym becomes a key pointing at its concept's expansion
+    keys = {}
+    for code, concept in concepts.items():
+        keys.setdefault(_code_key(code), code)
+        for name in concept["names"]:
+            keys.setdefault(normalize(name), code)
+
+    blob = bytearray()
+    group_offsets = {}
+    records = []
+    for key in sorted(keys, key=lambda k: k.encode("utf-8")):
+        code = keys[key]
+        if code not in group_offsets:
+            group = "\x00".join(expansions[code]).encode("utf-8")
+            group_offsets[code] = (len(blob), len(group))
+            blob += group
+        key_bytes = key.encode("utf-8")
+        records.append((len(blob), len(key_bytes), *group_offsets[code]))
+        blob += key_bytes
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as index_file:
+            index_file.write(HEADER.pack(MAGIC, len(records)))
+            for record in records:
+                index_file.write(RECORD.pack(*record))
+            index_file.write(blob)
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(records)
+
+
+class CodeIndex:
+    """
+    Memory-mapped, read-only view of a compiled code index.
+
+    Args:
+        index_path: Path written by compile_index
+    """
+
+    def __init__(self, index_path):
+        self._file = open(index_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{index_path} is not a compiled code index")
+        self._blob_start = HEADER.size + self._count * RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        """Release the memory map and file handle."""
+        self._map.close()
+        self._file.close()
+
+    def _record(self, position):
+        return RECORD.unpack_from(self._map, HEADER.size + position * RECORD.size)
+
+    def _key(self, record):
+        start = self._blob_start + record[0]
+        return self._map[start:start + record[1]]
+
+    def _lookup(self, key):
+        target = key.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record = self._record(middle)
+            current = self._key(record)
+            if current < target:
+                low = middle + 1
+            elif current > target:
+                high = middle
+            else:
+                start = self._blob_start + record[2]
+                return self._map[start:start + record[3]].decode("utf-8").split("\x00")
+        return None
+
+    def expand(self, term):
+        """
+        Expand a search term into equivalent codes and names.
+
+        Args:
+            term: Code ("E11"), name or synonym ("T2DM")
+
+        Returns:
+            dict: {"codes": [...], "names": [...], "acronyms": [...]}, or None
+            if the term is unknown
+        """
+        entries = self._lookup(_code_key(term)) or self._lookup(normalize(term))
+        if entries is None:
+            return None
+        return {
+            "codes": [entry[1:] for entry in entries if entry.startswith(CODE_PREFIX)],
+            "names": [entry[1:] for entry in entries if entry.startswith(NAME_PREFIX)],
+            "acronyms": [entry[1:] for entry in entries if entry.startswith(ACRONYM_PREFIX)],
+        }
+
+
+def expansion_predicate(expansion):
+    """
+    Build a matcher for AIService.match_unique_values from an expansion.
+
+    A value matches if it is one of the codes (or a sub-code such as
+    "E11.9" under "E11"), contains one of the names as whole words, or
+    contains one of the abbreviations as a whole word in upper case, so
+    that e.g. "AF" or "OA" do not match ordinary words.
+
+    Args:
+        expansion: Result of CodeIndex.expand
+
+    Returns:
+        function: Predicate taking the value with its original case; use
+        with AIService.match_unique_values(..., lowercase=False)
+    """
+    codes = {_code_key(code) for code in expansion["codes"]}
+    names = {f" {normalize(name)} " for name in expansion["names"]}
+    abbreviations = set(expansion.get("acronyms", ()))
+
+    def predicate(value):
+        stripped = value.strip().lower()
+        if stripped in codes or any(stripped.startswith(code + ".") for code in codes):
+            return True
+        padded = f" {normalize(value)} "
+        if any(name in padded for name in names):
+            return True
+        return not abbreviations.isdisjoint(re.findall(r"[A-Za-z0-9]+", value))
+
+    return predicate
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def default_index_path(source_path=DEFAULT_SOURCE):
+    """
+    Return the cache path of the compiled index for a code table.
+
+    The name includes a hash of the table and the index format, so an
+    edited table or a format change gets a fresh file.
+    """
+    digest = hashlib.sha256(MAGIC)
+    with open(source_path, "rb") as source_file:
+        digest.update(source_file.read())
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{digest.hexdigest()[:16]}.idx")
+
+
+def load_default_index():
+    """
+    Return the shared index for the bundled code table, compiling it into
+    the cache directory on first use.
+
+    Returns:
+        CodeIndex or None if the table is missing or cannot be compiled
+    """
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            try:
+                index_path = default_index_path()
+                if not os.path.exists(index_path):
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    compile_index(DEFAULT_SOURCE, index_path)
+                _default_index = CodeIndex(index_path)
+            except (OSError, ValueError, KeyError):
+                return None
+        return _default_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medical code/synonym index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = subparsers.add_parser("compile", help="Compile a code table CSV")
+    compile_parser.add_argument("source")
+    compile_parser.add_argument("index")
+
+    expand_parser = subparsers.add_parser("expand", help="Expand a term with the bundled table")
+    expand_parser.add_argument("term")
+
+    args = parser.parse_args()
+    if args.command == "compile":
+        count = compile_index(args.source, args.index)
+        print(f"Wrote {count} keys to {args.index}")
+    else:
+        index = load_default_index()
+        expansion = index.expand(args.term) if index else None
+        if expansion is None:
+            print(f"No expansion for '{args.term}'")
+        else:
+            print("Codes: " + ", ".join(expansion["codes"]))
+            print("Names: " + ", ".join(expansion["names"]))
+            print("Abbreviations: " + ", ".join(expansion["acronyms"]))
+
+
+if __name__ == "__main__":
+    main()
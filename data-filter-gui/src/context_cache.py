@@ -0,0 +1,107 @@
+"""
+Guideline context caching for the AI Medical Data Analyzer Application.
+
+The guideline PDF text is uploaded to the model backend once per content
+hash and referred to by handle in later requests, instead of being resent
+in every prompt. Handles have a TTL and are refreshed before they expire.
+"""
+
+import hashlib
+import threading
+import time
+
+
+# Default lifetime of a cached guideline context on the provider side
+DEFAULT_TTL_SECONDS = 3600
+
+# Refresh a handle when less than this much of its lifetime is left
+REFRESH_MARGIN_SECONDS = 120
+
+# Error codes meaning the provider no longer has (or no longer grants access to) a cached context
+CACHE_MISS_CODES = (403, 404)
+
+
+def text_hash(text):
+    """Return the SHA-256 of a text, used as the cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def supports_context_cache(backend):
+    """Return True if a backend implements create_cached_context."""
+    return callable(getattr(backend, "create_cached_context", None))
+
+
+def is_cache_miss(error):
+    """Return True if an API error means a cached context was not found or has expired."""
+    return getattr(error, "code", None) in CACHE_MISS_CODES
+
+
+class ContextCacheManager:
+    """
+    Tracks cached guideline contexts per (backend, model, text hash).
+
+    Args:
+        ttl_seconds: Lifetime requested for each cached context
+        refresh_margin: Seconds before expiry at which a context is refreshed
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, refresh_margin=REFRESH_MARGIN_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self._entries = {}
+        # key -> time before which creation is not retried (e.g. text too short to cache)
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def get(self, backend, model_name, text):
+        """
+        Return a live cached-context handle for the text, creating or
+        refreshing it as needed.
+
+        Args:
+            backend: Model backend
+            model_name: Model the context is cached for
+            text: Guideline text
+
+        Returns:
+            dict handle ({"name", "expires", ...}) or None if the backend
+            cannot cache this text
+        """
+        if not text or not supports_context_cache(backend):
+            return None
+
+        key = (id(backend), model_name, text_hash(text))
+        with self._lock:
+            handle = self._entries.get(key)
+            now = time.time()
+            if handle is not None and handle["expires"] - now > self.refresh_margin:
+                return handle
+            if self._failures.get(key, 0) > now:
+                return None
+
+            if handle is not None and callable(getattr(backend, "refresh_cached_context", None)):
+                try:
+                    handle = backend.refresh_cached_context(handle, self.ttl_seconds)
+                    self._entries[key] = handle
+                    return handle
+                except Exception:
+                    # Expired or evicted on the provider side; create a new one instead
+                    self._entries.pop(key, None)
+
+            try:
+                handle = backend.create_cached_context(text, model_name, self.ttl_seconds)
+            except Exception:
+                # Caching is an optimization; callers fall back to sending the text inline
+                self._entries.pop(key, None)
+                self._failures[key] = now + self.ttl_seconds
+                return None
+
+            self._entries[key] = handle
+            return handle
+
+    def invalidate(self, handle):
+        """Forget a handle the provider no longer recognises."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry is handle or entry.get("name") == handle.get("name"):
+                    del self._entries[key]
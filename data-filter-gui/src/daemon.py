@@ -0,0 +1,464 @@
+"""
+Watch-folder ingestion daemon for the AI Medical Data Analyzer Application.
+
+Watches a directory for new or changed Excel exports, queues one job per
+sheet in a durable SQLite queue, and processes jobs with a pool of worker
+threads using the regular read -> filter -> analyze -> save pipeline.
+
+Jobs are keyed by file content, so restarts never reprocess finished files.
+Paths are stored relative to the watch directory and resolved by each
+worker, so machines that mount the share at different paths agree on jobs.
+Workers hold time-limited leases on their jobs; a job whose worker died is
+picked up again once its lease expires. Several machines can point at the
+same queue database on a shared filesystem (the rollback journal is used
+rather than WAL for that reason).
+
+Usage:
+    python daemon.py watch /shared/intake --output /shared/analyzed --pdf guidelines.pdf \\
+        --column DiseaseName --term diabetes --workers 4
+    python daemon.py status /shared/intake
+"""
+
+import argparse
+import hashlib
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+
+from ai_service import AIService
+from file_utils import read_sheet_names, write_excel_file, write_json_file
+from model_backends import ConcurrencyLimitedBackend, create_backend
+from pipeline import HeadlessApp, run_analysis
+from tracing import tracer
+
+
+QUEUE_FILE_NAME = ".analyzer_queue.sqlite3"
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,  -- relative to the watch directory
+    sheet TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    output TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (path, sheet, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+
+def file_fingerprint(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobQueue:
+    """
+    Durable job queue stored in SQLite with lease-based claiming.
+
+    Args:
+        db_path: Queue database file
+        lease_seconds: How long a claim lasts without renewal
+        max_attempts: Attempts before a job is marked failed
+    """
+
+    def __init__(self, db_path, lease_seconds=300, max_attempts=3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per operation keeps this safe across threads
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return _Closing(connection)
+
+    def enqueue(self, path, sheet, fingerprint):
+        """
+        Add a job unless the same file content and sheet is already queued or done.
+
+        Returns:
+            bool: True if a new job was created
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO jobs (path, sheet, fingerprint, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (path, sheet, fingerprint, now, now),
+            )
+            return cursor.rowcount == 1
+
+    def claim(self, owner):
+        """
+        Atomically lease the oldest runnable job.
+
+        Returns:
+            sqlite3.Row or None
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # A worker died during the last allowed attempt: give up on the job
+                connection.execute(
+                    "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'Lease expired on final attempt'), "
+                    "lease_owner = NULL, lease_expires = NULL, updated = ? "
+                    "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                job = connection.execute(
+                    "SELECT * FROM jobs WHERE (status = 'pending' OR (status = 'running' AND lease_expires < ?)) "
+                    "AND attempts < ? ORDER BY id LIMIT 1",
+                    (now, self.max_attempts),
+                ).fetchone()
+                if job is None:
+                    connection.execute("COMMIT")
+                    return None
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires = ?, updated = ? WHERE id = ?",
+                    (owner, now + self.lease_seconds, now, job["id"]),
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return job
+
+    def renew(self, job_id, owner):
+        """
+        Extend a lease still held by owner.
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job_id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, owner, output):
+        """Mark a leased job as done."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'done', output = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated = ? WHERE id = ? AND lease_owner = ?",
+                (output, time.time(), job_id, owner),
+            )
+
+    def fail(self, job_id, owner, error):
+        """Record a failure; the job is retried until max_attempts is reached."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? WHERE id = ? AND lease_owner = ?",
+                (self.max_attempts, error, time.time(), job_id, owner),
+            )
+
+    def release(self, owner):
+        """Return every job leased by owner to the queue (used on shutdown)."""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+                "lease_expires = NULL, updated = ? WHERE lease_owner = ? AND status = 'running'",
+                (time.time(), owner),
+            )
+
+    def counts(self):
+        """Return {status: number of jobs}."""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+class _Closing:
+    """Context manager that closes a sqlite3 connection on exit."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, *exc_info):
+        self.connection.close()
+
+
+class FolderWatcher:
+    """
+    Polling directory watcher with debounce: a file is reported once its
+    size and modification time have not changed for debounce_seconds.
+
+    Args:
+        directory: Directory to watch
+        debounce_seconds: Quiet period before a file counts as complete
+    """
+
+    def __init__(self, directory, debounce_seconds=5.0):
+        self.directory = directory
+        self.debounce_seconds = debounce_seconds
+        self._seen = {}       # path -> (size, mtime, first time this state was seen)
+        self._reported = {}   # path -> (size, mtime) last reported
+
+    def poll(self):
+        """
+        Scan the directory once.
+
+        Returns:
+            list: Paths that became stable since the last report
+        """
+        now = time.time()
+        ready = []
+        current = set()
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not entry.is_file() or name.startswith((".", "~$")) or not name.lower().endswith(EXCEL_EXTENSIONS):
+                continue
+            path = entry.path
+            current.add(path)
+            stat = entry.stat()
+            state = (stat.st_size, stat.st_mtime)
+
+            previous = self._seen.get(path)
+            if previous is None or previous[:2] != state:
+                self._seen[path] = (*state, now)
+                continue
+            if now - previous[2] >= self.debounce_seconds and self._reported.get(path) != state:
+                self._reported[path] = state
+                ready.append(path)
+
+        for path in set(self._seen) - current:
+            self._seen.pop(path, None)
+            self._reported.pop(path, None)
+        return ready
+
+    def retry(self, path):
+        """Report a path again on the next poll, e.g. after it could not be opened."""
+        self._reported.pop(path, None)
+
+
+class IngestionDaemon:
+    """
+    Ties the watcher, queue and workers together.
+
+    Args:
+        watch_dir: Directory analysts drop exports into
+        output_dir: Directory results are written to
+        pdf_file_path: Guideline PDF
+        filter_column: Column to filter by
+        search_term: Term to search for
+        backend: Model backend shared by all workers
+        workers: Number of worker threads
+        queue: JobQueue (default: one stored in watch_dir)
+        sheets: Sheets to process per workbook (default: all)
+        poll_interval: Seconds between folder scans and idle queue polls
+        debounce_seconds: Quiet period before a dropped file is queued
+    """
+
+    def __init__(self, watch_dir, output_dir, pdf_file_path, filter_column, search_term, backend,
+                 workers=2, queue=None, sheets=None, poll_interval=2.0, debounce_seconds=5.0):
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir
+        self.pdf_file_path = pdf_file_path
+        self.filter_column = filter_column
+        self.search_term = search_term
+        self.workers = workers
+        self.sheets = sheets
+        self.poll_interval = poll_interval
+        self.queue = queue or JobQueue(os.path.join(watch_dir, QUEUE_FILE_NAME))
+        self.watcher = FolderWatcher(watch_dir, debounce_seconds)
+        self.status = HeadlessApp(echo=True, keep_messages=False)
+        self.ai_service = AIService(self.status, backend=ConcurrencyLimitedBackend(backend, workers))
+        self.stop_event = threading.Event()
+        self._owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def enqueue_ready_files(self):
+        """Queue a job for every sheet of each newly stable workbook."""
+        for path in self.watcher.poll():
+            try:
+                fingerprint = file_fingerprint(path)
+            except OSError as e:
+                self.status.add_to_status(f"Cannot read {path}: {e}")
+                self.watcher.retry(path)
+                continue
+            sheets = self.sheets
+            if not sheets:
+                sheets, error = read_sheet_names(path)
+                if error:
+                    # Often still locked by Excel or mid-copy; try again on the next poll
+                    self.status.add_to_status(f"{os.path.basename(path)}: {error}; will retry")
+                    self.watcher.retry(path)
+                    continue
+            relative_path = os.path.relpath(path, self.watch_dir)
+            for sheet in sheets:
+                if self.queue.enqueue(relative_path, sheet, fingerprint):
+                    self.status.add_to_status(f"Queued {os.path.basename(path)} [{sheet}]")
+
+    def _local_path(self, job):
+        """Resolve a job's path against this machine's view of the watch directory."""
+        return os.path.join(self.watch_dir, job["path"])
+
+    def _output_base(self, job):
+        base_name = os.path.splitext(os.path.basename(job["path"]))[0]
+        return os.path.join(
+            self.output_dir,
+            f"{base_name}_{job['sheet']}_by_{self.filter_column}_Analyzed_{job['fingerprint'][:8]}",
+        )
+
+    def process_job(self, job, owner):
+        """Run the pipeline for one leased job and write its outputs atomically."""
+        label = f"{os.path.basename(job['path'])} [{job['sheet']}]"
+        self.status.add_to_status(f"{owner}: processing {label} (attempt {job['attempts'] + 1})")
+
+        lost_lease = threading.Event()
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(self.queue.lease_seconds / 3):
+                if not self.queue.renew(job["id"], owner):
+                    lost_lease.set()
+                    return
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            local_path = self._local_path(job)
+            if not os.path.isfile(local_path):
+                raise FileNotFoundError(f"{local_path} not found on this machine")
+            response_df, error = run_analysis(
+                self.ai_service, local_path, job["sheet"], self.filter_column, self.search_term, self.pdf_file_path
+            )
+        except Exception as e:
+            response_df, error = None, str(e)
+        finally:
+            finished.set()
+            heartbeat_thread.join()
+
+        if lost_lease.is_set():
+            self.status.add_to_status(f"{owner}: lease on {label} was lost; discarding result")
+            return
+        if error:
+            self.queue.fail(job["id"], owner, error)
+            self.status.add_to_status(f"{owner}: {label} failed: {error}")
+            return
+
+        base = self._output_base(job)
+        excel_tmp, json_tmp = base + ".tmp.xlsx", base + ".tmp.json"
+        write_excel_file(response_df, excel_tmp, "Analyzed")
+        write_json_file(response_df.to_dict(orient="records"), json_tmp)
+        os.replace(excel_tmp, base + ".xlsx")
+        os.replace(json_tmp, base + ".json")
+
+        self.queue.complete(job["id"], owner, base + ".xlsx")
+        self.status.add_to_status(f"{owner}: {label} done -> {os.path.basename(base)}.xlsx")
+
+    def _worker(self, worker_number):
+        owner = f"{self._owner_prefix}:{worker_number}"
+        try:
+            while not self.stop_event.is_set():
+                job = self.queue.claim(owner)
+                if job is None:
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                try:
+                    self.process_job(job, owner)
+                except Exception as e:
+                    self.queue.fail(job["id"], owner, str(e))
+                    self.status.add_to_status(f"{owner}: unexpected error: {e}")
+                finally:
+                    # The tracer is process-wide; drop this job's spans so they do not pile up
+                    tracer.take_spans(threading.current_thread().name)
+        finally:
+            self.queue.release(owner)
+
+    def run(self):
+        """Watch and process until interrupted."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: self.stop_event.set())
+        threads = [
+            threading.Thread(target=self._worker, args=(number,), name=f"worker-{number}", daemon=True)
+            for number in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        self.status.add_to_status(f"Watching {self.watch_dir} with {self.workers} worker(s)")
+
+        try:
+            while not self.stop_event.is_set():
+                self.enqueue_ready_files()
+                self.stop_event.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            self.status.add_to_status("Shutting down...")
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch-folder ingestion daemon")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    watch = subparsers.add_parser("watch", help="Watch a folder and process new workbooks")
+    watch.add_argument("directory")
+    watch.add_argument("--output", required=True, help="Directory for results")
+    watch.add_argument("--pdf", required=True, help="Guideline PDF")
+    watch.add_argument("--column", required=True, help="Column to filter by")
+    watch.add_argument("--term", required=True, help="Search term")
+    watch.add_argument("--sheets", nargs="*", help="Sheets to process (default: all)")
+    watch.add_argument("--workers", type=int, default=2)
+    watch.add_argument("--db", help=f"Queue database (default: <directory>/{QUEUE_FILE_NAME})")
+    watch.add_argument("--lease-seconds", type=float, default=300)
+    watch.add_argument("--max-attempts", type=int, default=3)
+    watch.add_argument("--poll-interval", type=float, default=2.0)
+    watch.add_argument("--debounce", type=float, default=5.0)
+    watch.add_argument("--mock", action="store_true", help="Use the local mock backend instead of Gemini")
+
+    status = subparsers.add_parser("status", help="Show queue counts")
+    status.add_argument("directory")
+    status.add_argument("--db")
+
+    args = parser.parse_args()
+    db_path = args.db or os.path.join(args.directory, QUEUE_FILE_NAME)
+
+    if args.command == "status":
+        for job_status, count in sorted(JobQueue(db_path).counts().items()):
+            print(f"{job_status}: {count}")
+        return
+
+    backend = create_backend(args.mock)
+
+    daemon = IngestionDaemon(
+        args.directory, args.output, args.pdf, args.column, args.term.lower(), backend,
+        workers=args.workers,
+        queue=JobQueue(db_path, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts),
+        sheets=args.sheets,
+        poll_interval=args.poll_interval,
+        debounce_seconds=args.debounce,
+    )
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -77,9 +77,7 @@ class DataProcessor:
                 
             self.app.add_to_status(f"Found {len(filtered_df)} records where {filter_column} contains '{search_term}'")
 
-            # Save the original data for later merging
             filtered_df = filtered_df.reset_index(drop=True)
-            original_df = filtered_df.copy()
 
             # Read the PDF file
             self.app.add_to_status("Reading PDF file...")
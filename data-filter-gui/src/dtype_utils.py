@@ -0,0 +1,209 @@
+"""
+DataFrame memory utilities for the AI Medical Data Analyzer Application.
+Shrinks freshly loaded sheets (categoricals for repetitive text, downcast
+numerics, Arrow-backed strings when pyarrow is installed) and reports how
+much memory was saved. Sheets streamed row by row can also be built in
+compact form directly, so the full object-dtype frame never exists.
+"""
+
+from array import array
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from pandas.api import types as ptypes  # type: ignore
+from pandas.io.parsers import TextParser  # type: ignore
+
+try:
+    import pyarrow  # type: ignore  # noqa: F401
+    ARROW_STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    ARROW_STRING_DTYPE = None
+
+
+# Text columns whose unique/total ratio is below this become categoricals
+CATEGORY_RATIO = 0.5
+
+
+def memory_usage_mb(df):
+    """Return the deep memory usage of a dataframe in megabytes."""
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def _is_text_column(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return False
+    if ptypes.is_object_dtype(series.dtype):
+        return ptypes.infer_dtype(series, skipna=True) == "string"
+    return ptypes.is_string_dtype(series.dtype)
+
+
+def _downcast_numeric(series):
+    if ptypes.is_bool_dtype(series.dtype):
+        return series
+    if ptypes.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast="integer")
+    if ptypes.is_float_dtype(series.dtype):
+        downcast = pd.to_numeric(series, downcast="float")
+        # Keep float64 unless every value survives the round trip unchanged
+        if downcast.dtype != series.dtype and downcast.astype(series.dtype).equals(series):
+            return downcast
+    return series
+
+
+def optimize_dtypes(df, category_ratio=CATEGORY_RATIO):
+    """
+    Convert a dataframe to compact dtypes without changing its values.
+
+    Args:
+        df: DataFrame to optimize (modified in place and returned)
+        category_ratio: Unique/total ratio below which text becomes categorical
+
+    Returns:
+        tuple: (optimized dataframe, report dict with before/after MB and per-column dtypes)
+    """
+    before_mb = memory_usage_mb(df)
+    conversions = {}
+
+    for column in df.columns:
+        series = df[column]
+        old_dtype = str(series.dtype)
+
+        if ptypes.is_numeric_dtype(series.dtype):
+            new_series = _downcast_numeric(series)
+        elif _is_text_column(series):
+            non_null = series.count()
+            if non_null and series.nunique(dropna=True) / non_null < category_ratio:
+                new_series = series.astype("category")
+            elif ARROW_STRING_DTYPE:
+                new_series = series.astype(ARROW_STRING_DTYPE)
+            else:
+                new_series = series
+        else:
+            new_series = series
+
+        if str(new_series.dtype) != old_dtype:
+            df[column] = new_series
+            conversions[column] = f"{old_dtype} -> {new_series.dtype}"
+
+    report = {
+        "before_mb": round(before_mb, 3),
+        "after_mb": round(memory_usage_mb(df), 3),
+        "conversions": conversions,
+    }
+    return df, report
+
+
+class _ColumnBuilder:
+    """
+    Dictionary-encodes one column while rows stream in, switching to a plain
+    list once the column proves too varied to benefit.
+
+    Args:
+        category_ratio: Unique/total ratio above which encoding stops
+    """
+
+    # Rows seen before the unique ratio is trusted
+    MIN_ROWS = 1000
+
+    def __init__(self, category_ratio):
+        self.category_ratio = category_ratio
+        self.codes = array("i")
+        self.values = []
+        self._lookup = {}
+        self.plain = None
+
+    def append(self, value):
+        if self.plain is not None:
+            self.plain.append(value)
+            return
+        # Key on the type too, so 1, 1.0 and True stay distinct
+        key = (value.__class__, value)
+        code = self._lookup.get(key)
+        if code is None:
+            code = len(self.values)
+            self._lookup[key] = code
+            self.values.append(value)
+            if code >= self.MIN_ROWS and code > self.category_ratio * len(self.codes):
+                self.plain = [self.values[existing] for existing in self.codes]
+                self.plain.append(value)
+                self.codes, self.values, self._lookup = array("i"), [], {}
+                return
+        self.codes.append(code)
+
+    def build(self):
+        """
+        Return the column as pandas would have parsed it. For encoded
+        columns only the distinct values go through the parser; the full
+        column then shares their objects instead of holding one per cell.
+        """
+        if self.plain is not None:
+            return TextParser([[value] for value in self.plain], header=None, skip_blank_lines=False).read()[0]
+        parsed = TextParser([[value] for value in self.values], header=None, skip_blank_lines=False).read()[0]
+        codes = np.frombuffer(self.codes, dtype=np.int32) if len(self.codes) else np.empty(0, dtype=np.int32)
+        return parsed.take(codes).reset_index(drop=True)
+
+
+def frame_from_rows(header, rows, category_ratio=CATEGORY_RATIO):
+    """
+    Build an optimized dataframe from streamed rows.
+
+    Each column is dictionary-encoded as rows arrive, so repeated text is
+    held once rather than as one object per cell, and the result is then
+    shrunk with optimize_dtypes. The values and dtypes match reading the
+    same rows with pandas and calling optimize_dtypes.
+
+    Args:
+        header: Column names
+        rows: Iterable of row sequences of cell values as pandas' reader
+            converts them ("" for empty cells)
+        category_ratio: Unique/total ratio below which text becomes categorical
+
+    Returns:
+        tuple: (optimized dataframe, optimize_dtypes report)
+    """
+    header = list(header)
+    builders = [_ColumnBuilder(category_ratio) for _ in header]
+    row_count = 0
+    pending_empty = 0
+    for row in rows:
+        if all(value == "" for value in row):
+            # Trailing empty rows are dropped, so hold these back until data follows
+            pending_empty += 1
+            continue
+        for _ in range(pending_empty):
+            for builder in builders:
+                builder.append("")
+        row_count += pending_empty
+        pending_empty = 0
+
+        # Cells beyond the header become unnamed columns, empty in earlier rows
+        while len(builders) < len(row):
+            header.append(f"Unnamed: {len(builders)}")
+            builder = _ColumnBuilder(category_ratio)
+            for _ in range(row_count):
+                builder.append("")
+            builders.append(builder)
+
+        for builder, value in zip(builders, row):
+            builder.append(value)
+        for builder in builders[len(row):]:
+            builder.append("")
+        row_count += 1
+
+    df = pd.DataFrame(
+        {position: builder.build() for position, builder in enumerate(builders)}
+    )
+    df.columns = header
+    return optimize_dtypes(df, category_ratio)
+
+
+def format_memory_report(report):
+    """
+    Format an optimize_dtypes report for the status box.
+
+    Returns:
+        str: One-line summary
+    """
+    saved = report["before_mb"] - report["after_mb"]
+    return (f"Memory: {report['before_mb']:.1f} MB -> {report['after_mb']:.1f} MB "
+            f"({saved:.1f} MB saved, {len(report['conversions'])} column(s) converted)")
@@ -5,28 +5,216 @@ Handles file operations like reading Excel/PDF files and saving output files.
 
 import os
 import json
+import time
+import importlib.util
+from datetime import date, datetime, time as datetime_time, timedelta
 import pandas as pd  # type: ignore
 import fitz  # type: ignore
 from tkinter import filedialog, messagebox
 
+from dtype_utils import frame_from_rows, optimize_dtypes
+from tracing import traced, tracer
 
-def read_excel_file(file_path, sheet_name):
+
+# Workbooks smaller than this parse fast enough with openpyxl that the
+# native reader brings no noticeable gain
+CALAMINE_MIN_BYTES = 512 * 1024
+
+# Formats openpyxl cannot read at all
+NON_OPENPYXL_EXTENSIONS = (".xls", ".xlsb", ".ods")
+
+
+def calamine_available():
+    """Return True if the native calamine reader can be used by pandas."""
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def select_excel_engine(file_path):
+    """
+    Choose the pandas Excel engine for a workbook.
+    
+    Args:
+        file_path: Path to the Excel file
+        
+    Returns:
+        str or None: "calamine", "openpyxl", or None to let pandas decide
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if calamine_available():
+        if extension in NON_OPENPYXL_EXTENSIONS:
+            return "calamine"
+        try:
+            if os.path.getsize(file_path) >= CALAMINE_MIN_BYTES:
+                return "calamine"
+        except OSError:
+            pass
+    return _fallback_engine(file_path)
+
+
+def _fallback_engine(file_path):
+    """Engine to use when calamine is unavailable or failed on a workbook."""
+    extension = os.path.splitext(file_path)[1].lower()
+    return None if extension in NON_OPENPYXL_EXTENSIONS else "openpyxl"
+
+
+def _convert_calamine_cell(value):
+    """Convert a calamine cell the way pandas' calamine reader does."""
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    if isinstance(value, (datetime, timedelta, datetime_time)):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def _convert_openpyxl_cell(cell):
+    """Convert an openpyxl cell the way pandas' openpyxl reader does."""
+    if cell.value is None:
+        return ""
+    if cell.data_type == "e":
+        return float("nan")
+    if cell.data_type == "n":
+        return int(cell.value) if int(cell.value) == cell.value else float(cell.value)
+    return cell.value
+
+
+def _header_names(cells):
+    """Column names as pandas builds them from a converted header row."""
+    names = []
+    seen = {}
+    for position, cell in enumerate(cells):
+        name = f"Unnamed: {position}" if cell == "" else cell
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _read_calamine_compact(file_path, sheet_name):
+    """
+    Stream a sheet with calamine straight into compact columns.
+
+    Returns:
+        tuple: (dataframe, memory report), or None when the sheet layout
+        needs the regular pandas reader (data not starting at A1)
+    """
+    import python_calamine  # type: ignore
+
+    workbook = python_calamine.CalamineWorkbook.from_path(file_path)
+    try:
+        if isinstance(sheet_name, int):
+            sheet = workbook.get_sheet_by_index(sheet_name)
+        else:
+            sheet = workbook.get_sheet_by_name(sheet_name)
+    except python_calamine.WorksheetNotFound:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    if sheet.start not in (None, (0, 0)):
+        return None
+
+    rows = ([_convert_calamine_cell(cell) for cell in row] for row in sheet.iter_rows())
+    return frame_from_rows(_header_names(next(rows, [])), rows)
+
+
+def _read_openpyxl_compact(file_path, sheet_name):
+    """
+    Stream a sheet with openpyxl's read-only mode straight into compact columns.
+
+    Returns:
+        tuple: (dataframe, memory report)
+    """
+    from openpyxl import load_workbook  # type: ignore
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        try:
+            sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        except (KeyError, IndexError):
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        sheet.reset_dimensions()
+        rows = ([_convert_openpyxl_cell(cell) for cell in row] for row in sheet.rows)
+        return frame_from_rows(_header_names(next(rows, [])), rows)
+    finally:
+        workbook.close()
+
+
+# Engines whose rows can be streamed into compact columns
+COMPACT_READERS = {
+    "calamine": _read_calamine_compact,
+    "openpyxl": _read_openpyxl_compact,
+}
+
+
+def _parse_excel(file_path, sheet_name, engine, optimize_memory=False):
+    """
+    Parse a sheet, falling back to the default engine if calamine fails on the workbook.
+
+    With optimize_memory, rows are streamed into compact columns instead of
+    building the full object-dtype frame first, which lowers peak memory.
+    
+    Returns:
+        tuple: (dataframe, engine actually used, parse seconds, memory report
+        or None if the dataframe still needs optimize_dtypes)
+    """
+    started = time.perf_counter()
+    try:
+        if optimize_memory and engine in COMPACT_READERS:
+            compact = COMPACT_READERS[engine](file_path, sheet_name)
+            if compact is not None:
+                df, report = compact
+                return df, engine, time.perf_counter() - started, report
+        df = pd.read_excel(file_path, sheet_name=sheet_name, engine=engine)
+    except ValueError:
+        raise
+    except Exception:
+        if engine != "calamine":
+            raise
+        engine = _fallback_engine(file_path)
+        started = time.perf_counter()
+        df = pd.read_excel(file_path, sheet_name=sheet_name, engine=engine)
+    return df, engine, time.perf_counter() - started, None
+
+
+@traced()
+def read_excel_file(file_path, sheet_name, optimize_memory=True, engine="auto"):
     """
     Read data from an Excel file.
     
     Args:
         file_path: Path to the Excel file
         sheet_name: Name of the sheet to read
+        optimize_memory: Convert columns to compact dtypes after loading;
+            the memory report is stored in df.attrs["memory_report"]
+        engine: "auto" to pick per workbook, or a pandas engine name; the
+            engine used and parse time are stored in df.attrs["excel_engine"]
+            and df.attrs["parse_seconds"]
         
     Returns:
         tuple: (dataframe or None, error message or None)
     """
     try:
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        if engine == "auto":
+            engine = select_excel_engine(file_path)
+        with tracer.span("parse_excel", engine=engine) as span:
+            df, engine, parse_seconds, report = _parse_excel(file_path, sheet_name, engine, optimize_memory)
+            span["attributes"]["engine"] = engine
+        df.attrs["source"] = (os.path.abspath(file_path), os.path.getmtime(file_path), sheet_name)
+        df.attrs["excel_engine"] = engine or "default"
+        df.attrs["parse_seconds"] = parse_seconds
+        if optimize_memory and report is not None:
+            df.attrs["memory_report"] = report
+        elif optimize_memory:
+            with tracer.span("optimize_dtypes") as span:
+                df, report = optimize_dtypes(df)
+                span["attributes"].update(before_mb=report["before_mb"], after_mb=report["after_mb"])
+            df.attrs["memory_report"] = report
         return df, None
     except ValueError as sheet_error:
         if "Worksheet named" in str(sheet_error) and "not found" in str(sheet_error):
-            available_sheets = pd.ExcelFile(file_path).sheet_names
+            available_sheets = get_available_sheets(file_path)
             sheet_list = ", ".join(available_sheets)
             error_msg = f"Sheet '{sheet_name}' not found. Available sheets: {sheet_list}"
             return None, error_msg
@@ -36,6 +224,25 @@ def read_excel_file(file_path, sheet_name):
         return None, str(e)
 
 
+def read_sheet_names(excel_file_path):
+    """
+    Get list of available sheets in an Excel file, keeping the reason it
+    could not be opened.
+    
+    Args:
+        excel_file_path: Path to the Excel file
+        
+    Returns:
+        tuple: (list of sheet names or None, error message or None)
+    """
+    try:
+        engine = select_excel_engine(excel_file_path)
+        with pd.ExcelFile(excel_file_path, engine=engine) as workbook:
+            return workbook.sheet_names, None
+    except Exception as e:
+        return None, f"Cannot open workbook: {str(e)}"
+
+
 def get_available_sheets(excel_file_path):
     """
     Get list of available sheets in an Excel file.
@@ -46,12 +253,11 @@ def get_available_sheets(excel_file_path):
     Returns:
         list: List of sheet names, or empty list if error
     """
-    try:
-        return pd.ExcelFile(excel_file_path).sheet_names
-    except Exception:
-        return []
+    sheets, _ = read_sheet_names(excel_file_path)
+    return sheets or []
 
 
+@traced()
 def read_pdf_file(pdf_file_path):
     """
     Extract text from a PDF file.
@@ -71,6 +277,33 @@ def read_pdf_file(pdf_file_path):
         return None, str(e)
 
 
+@traced()
+def write_json_file(data, output_path):
+    """
+    Write JSON data to a file without any dialogs.
+    
+    Args:
+        data: JSON-serializable data to write
+        output_path: Destination file path
+    """
+    with open(output_path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, indent=4)
+
+
+@traced()
+def write_excel_file(df, output_path, sheet_name):
+    """
+    Write a dataframe to a new Excel file without any dialogs.
+    
+    Args:
+        df: DataFrame to write
+        output_path: Destination file path
+        sheet_name: Name of the sheet to create
+    """
+    df.to_excel(output_path, sheet_name=sheet_name, index=False)
+
+
+@traced()
 def save_to_json(response_json, excel_file_path, filter_column, is_new_file=True):
     """
     Save data to a JSON file, either new or appending to existing.
@@ -100,8 +333,7 @@ def save_to_json(response_json, excel_file_path, filter_column, is_new_file=True
             return None, "JSON file save cancelled."
             
         try:
-            with open(output_json_path, "w", encoding="utf-8") as json_file:
-                json.dump(response_json, json_file, indent=4)
+            write_json_file(response_json, output_json_path)
             return output_json_path, None
         except Exception as e:
             return None, f"Error saving JSON: {str(e)}"
@@ -131,8 +363,7 @@ def save_to_json(response_json, excel_file_path, filter_column, is_new_file=True
                         combined_data = existing_data + response_json
                         
                         # Write back the combined data
-                        with open(target_json_path, "w", encoding="utf-8") as out_file:
-                            json.dump(combined_data, out_file, indent=4)
+                        write_json_file(combined_data, target_json_path)
                         
                         return target_json_path, None
                     else:
@@ -149,6 +380,7 @@ def save_to_json(response_json, excel_file_path, filter_column, is_new_file=True
                 return None, f"Error appending to JSON: {str(json_error)}"
 
 
+@traced()
 def save_to_excel(response_df, excel_file_path, sheet_name, filter_column, is_new_file=True):
     """
     Save dataframe to Excel file, either new or as a new sheet in existing file.
@@ -181,7 +413,7 @@ def save_to_excel(response_df, excel_file_path, sheet_name, filter_column, is_ne
             return None, "Excel file save cancelled."
             
         try:
-            response_df.to_excel(output_excel_path, sheet_name=analyzed_sheet_name, index=False)
+            write_excel_file(response_df, output_excel_path, analyzed_sheet_name)
             return output_excel_path, None
         except Exception as e:
             return None, f"Error saving Excel file: {str(e)}"
@@ -230,7 +462,7 @@ def save_to_excel(response_df, excel_file_path, sheet_name, filter_column, is_ne
                     )
                     
                     if new_excel_path:
-                        response_df.to_excel(new_excel_path, sheet_name=analyzed_sheet_name, index=False)
+                        write_excel_file(response_df, new_excel_path, analyzed_sheet_name)
                         return new_excel_path, None
                     else:
                         return None, "Excel file save cancelled."
@@ -250,7 +482,7 @@ def save_to_excel(response_df, excel_file_path, sheet_name, filter_column, is_ne
                 )
                 
                 if new_excel_path:
-                    response_df.to_excel(new_excel_path, sheet_name=analyzed_sheet_name, index=False)
+                    write_excel_file(response_df, new_excel_path, analyzed_sheet_name)
                     return new_excel_path, None
                 else:
                     return None, "Excel file save cancelled."
@@ -258,6 +490,55 @@ def save_to_excel(response_df, excel_file_path, sheet_name, filter_column, is_ne
                 return None, f"Error checking existing sheets: {str(e)}"
 
 
+# Sheet (and JSON key) holding every row matched by a multi-query run
+ALL_MATCHES_SHEET = "All matches"
+
+
+@traced()
+def save_query_results(results_by_query, excel_file_path, sheet_name, matched_df=None):
+    """
+    Save per-query results of a multi-query run: one Excel sheet per query
+    plus a JSON file with the same base name keyed by query.
+    
+    Args:
+        results_by_query: Dict of query name -> {"text", "records"}
+        excel_file_path: Path to the source Excel file (for naming)
+        sheet_name: Original sheet name (for naming)
+        matched_df: Rows matching any query, tagged with the queries they
+            matched; saved first as an "All matches" sheet and JSON entry
+        
+    Returns:
+        tuple: ((excel_path, json_path) or None, error message or None)
+    """
+    base_name = os.path.splitext(os.path.basename(excel_file_path))[0]
+    output_excel_path = filedialog.asksaveasfilename(
+        defaultextension=".xlsx", 
+        filetypes=[("Excel files", "*.xlsx")],
+        title="Save query results",
+        initialfile=f"{base_name}_{sheet_name}_Queries_Analyzed.xlsx"
+    )
+    
+    if not output_excel_path:
+        return None, "Query results save cancelled."
+        
+    output_json_path = os.path.splitext(output_excel_path)[0] + ".json"
+    try:
+        if matched_df is not None:
+            all_matches = {"text": "Rows matching at least one query",
+                           "records": json.loads(matched_df.to_json(orient="records", date_format="iso"))}
+            results_by_query = {ALL_MATCHES_SHEET: all_matches, **results_by_query}
+        with pd.ExcelWriter(output_excel_path, engine='openpyxl') as writer:
+            if matched_df is not None:
+                matched_df.to_excel(writer, sheet_name=ALL_MATCHES_SHEET, index=False)
+            for name, result in results_by_query.items():
+                if name != ALL_MATCHES_SHEET:
+                    pd.DataFrame(result["records"]).to_excel(writer, sheet_name=name, index=False)
+        write_json_file(results_by_query, output_json_path)
+        return (output_excel_path, output_json_path), None
+    except Exception as e:
+        return None, f"Error saving query results: {str(e)}"
+
+
 def extract_json_from_text(text):
     """
     Extract JSON from AI response text.
@@ -0,0 +1,196 @@
+"""
+Local fuzzy matching for the AI Medical Data Analyzer Application.
+Builds a trigram index over the distinct values of a column so that
+misspellings ("diabetis") and abbreviations ("DM2") can be resolved
+locally before any AI round-trip.
+"""
+
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd  # type: ignore
+
+
+# Candidates below this score are dropped entirely
+MIN_SCORE = 0.6
+
+# Abbreviations shorter than this are too ambiguous to accept without the AI
+MIN_CERTAIN_ACRONYM = 3
+
+# Words skipped when building abbreviations ("Diabetes Mellitus Type 2" -> "DM2")
+ACRONYM_STOPWORDS = {"type", "of", "the", "and", "with", "without", "due", "to", "in"}
+
+# Number of column indexes kept in memory
+CACHE_SIZE = 32
+
+
+def normalize(text):
+    """Lower-case a value and collapse punctuation and whitespace."""
+    return " ".join(re.findall(r"[a-z0-9]+", str(text).lower()))
+
+
+def trigrams(word):
+    """Return the set of padded character trigrams of a single word."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def acronyms(normalized):
+    """
+    Build abbreviation forms of a normalized value.
+
+    "diabetes mellitus type 2" gives {"dmt2", "dm2"}.
+    """
+    words = normalized.split()
+    if len(words) < 2:
+        return set()
+
+    def initials(selected):
+        return "".join(word if word.isdigit() else word[0] for word in selected)
+
+    forms = {initials(words)}
+    short = [word for word in words if word not in ACRONYM_STOPWORDS]
+    if len(short) >= 2:
+        forms.add(initials(short))
+    return forms
+
+
+class TrigramIndex:
+    """
+    Fuzzy search index over a set of distinct values.
+
+    Args:
+        values: Iterable of distinct column values
+    """
+
+    def __init__(self, values):
+        self.values = [value for value in values if not pd.isna(value)]
+        self._normalized = [normalize(value) for value in self.values]
+        self._postings = defaultdict(set)
+        self._acronyms = defaultdict(set)
+
+        for value_id, normalized in enumerate(self._normalized):
+            for word in normalized.split():
+                for gram in trigrams(word):
+                    self._postings[gram].add(value_id)
+            for form in acronyms(normalized):
+                self._acronyms[form].add(value_id)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _window_score(self, term, value_id):
+        """Best similarity between the term and any same-length word window of a value."""
+        words = self._normalized[value_id].split()
+        width = max(1, len(term.split()))
+        best = SequenceMatcher(None, term, self._normalized[value_id]).ratio()
+        for start in range(max(1, len(words) - width + 1)):
+            window = " ".join(words[start:start + width])
+            best = max(best, SequenceMatcher(None, term, window).ratio())
+        return best
+
+    def search(self, term, limit=20, min_score=MIN_SCORE):
+        """
+        Find values resembling a search term.
+
+        Args:
+            term: Search term as typed by the user
+            limit: Maximum number of candidates returned
+            min_score: Lowest similarity (0-1) to keep
+
+        Returns:
+            list: (value, score, certain) tuples, best first. Only containment
+            and abbreviation hits are certain; edit-similarity candidates never
+            are, since one character can separate two different diseases
+            ("hypothyroidism"/"hyperthyroidism", "type 1"/"type 2").
+        """
+        normalized_term = normalize(term)
+        if not normalized_term:
+            return []
+
+        scores = {}
+        certain = set()
+
+        # Plain containment is always a certain match
+        for value_id, normalized in enumerate(self._normalized):
+            if normalized_term in normalized:
+                scores[value_id] = 1.0
+                certain.add(value_id)
+
+        # Abbreviations; very short ones are ambiguous and left for the AI
+        compact_term = normalized_term.replace(" ", "")
+        acronym_certain = len(compact_term) >= MIN_CERTAIN_ACRONYM
+        for value_id in self._acronyms.get(compact_term, ()):
+            if value_id not in scores:
+                scores[value_id] = 0.9 if acronym_certain else 0.7
+                if acronym_certain:
+                    certain.add(value_id)
+
+        # Trigram candidates, ranked by edit similarity
+        term_grams = set()
+        for word in normalized_term.split():
+            term_grams |= trigrams(word)
+        hits = defaultdict(int)
+        for gram in term_grams:
+            for value_id in self._postings.get(gram, ()):
+                hits[value_id] += 1
+        required = max(1, len(term_grams) // 3)
+        for value_id, count in hits.items():
+            if value_id in scores or count < required:
+                continue
+            score = self._window_score(normalized_term, value_id)
+            if score >= min_score:
+                scores[value_id] = score
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            (self.values[value_id], round(score, 3), value_id in certain)
+            for value_id, score in ranked
+        ]
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _distinct_values(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.categories
+    return column.dropna().unique()
+
+
+def get_column_index(df, column_name):
+    """
+    Return the cached TrigramIndex for a dataframe column, building it if needed.
+
+    The cache key is the workbook source recorded by read_excel_file in
+    df.attrs["source"] plus the column name, so the index is reused across
+    searches on the same sheet and rebuilt when the file changes.
+
+    Args:
+        df: DataFrame holding the column
+        column_name: Column to index
+
+    Returns:
+        TrigramIndex
+    """
+    column = df[column_name]
+    source = df.attrs.get("source")
+    if source is None:
+        # No workbook identity; key on the distinct values themselves
+        source = hash(tuple(str(value) for value in _distinct_values(column)))
+    key = (source, column_name)
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    index = TrigramIndex(_distinct_values(column))
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
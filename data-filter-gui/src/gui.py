@@ -1,11 +1,15 @@
 import os
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from dotenv import load_dotenv  # type: ignore
 
-# Import local modules
-from ai_service import AIService
-from file_utils import save_to_json, save_to_excel, read_excel_file, read_pdf_file
+# Import local modules. The analysis modules pull in pandas, PyMuPDF and the
+# Gemini SDK, so they are imported where used and warmed up in the background
+# once the window is on screen.
+from tracing import tracer
+
+# Modules loaded by the background warm-up
+WARMUP_MODULES = ("file_utils", "query", "batch", "dtype_utils", "preview")
 
 class DataFilterApp:
     def __init__(self, master):
@@ -33,26 +37,74 @@ class DataFilterApp:
         # Output options
         self.output_option = tk.StringVar(value="new_file")
 
-        # Initialize the AI service
-        self.ai_service = AIService(self)
-
-        # Load environment variables and configure AI
-        self._configure_ai()
+        # The AI service is created by the background warm-up
+        self._ai_service = None
+        self._services_ready = threading.Event()
+        self._warmup_error = None
+        self.gemini_api_key = None
 
         # Create UI components
         self.create_widgets()
+        # Nothing can be analyzed until the warm-up has configured the AI service
+        self._set_action_buttons("disabled")
+
+        # Load the heavy modules and configure AI shortly after the first paint
+        master.after(50, self._start_warmup)
+
+    @property
+    def ai_service(self):
+        """AI service configured by the background warm-up."""
+        if not self._services_ready.is_set():
+            raise RuntimeError("Analysis modules are still loading; please try again in a moment.")
+        if self._ai_service is None:
+            raise RuntimeError(f"AI service unavailable: {self._warmup_error}")
+        return self._ai_service
+
+    def _start_warmup(self):
+        """Start loading the analysis modules off the UI thread."""
+        threading.Thread(target=self._configure_ai, name="warmup", daemon=True).start()
+        self._poll_warmup()
 
     def _configure_ai(self):
-        """Load API key and configure AI service."""
-        # Load environment variables from .env file (if it exists)
-        load_dotenv()
+        """Import the analysis modules, load the API key and configure the AI service."""
+        try:
+            import importlib
+            from dotenv import load_dotenv  # type: ignore
+            from ai_service import AIService
+
+            for module_name in WARMUP_MODULES:
+                importlib.import_module(module_name)
+
+            # Load environment variables from .env file (if it exists)
+            load_dotenv()
+
+            # Get API key from environment variables
+            self.gemini_api_key = os.environ.get("GEMINI_API_KEY")
+            ai_service = AIService(self)
+            if self.gemini_api_key:
+                ai_service.configure_api(self.gemini_api_key)
+            self._ai_service = ai_service
+        except Exception as e:
+            self._warmup_error = str(e)
+        finally:
+            self._services_ready.set()
+
+    def _poll_warmup(self):
+        """Report the outcome of the warm-up on the UI thread once it finishes."""
+        if not self._services_ready.is_set():
+            self.master.after(50, self._poll_warmup)
+            return
 
-        # Get API key from environment variables
-        self.gemini_api_key = os.environ.get("GEMINI_API_KEY")
-        if not self.gemini_api_key:
+        self._set_action_buttons("normal")
+        if self._warmup_error:
+            self.add_to_status(f"Error loading analysis modules: {self._warmup_error}")
+        elif not self.gemini_api_key:
             messagebox.showerror("API Key Error", "Gemini API key not found in environment variables. Please set GEMINI_API_KEY.")
-        else:
-            self.ai_service.configure_api(self.gemini_api_key)
+
+    def _set_action_buttons(self, state):
+        """Enable or disable the Process, Preview and Batch buttons together."""
+        for button in (self.process_button, self.preview_button, self.batch_button):
+            button.config(state=state)
 
     def create_widgets(self):
         """Create all UI components."""
@@ -126,6 +178,9 @@ class DataFilterApp:
         self.search_term_entry = ttk.Entry(search_frame, width=30)
         self.search_term_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
+        ttk.Label(params_frame, text="Multiple queries: Column=term AND Column=term; Column=term",
+                  foreground="gray").pack(anchor=tk.W)
+        
         # Output options section
         output_frame = ttk.LabelFrame(main_frame, text="Output Options", padding=15)
         output_frame.pack(fill=tk.X, pady=(0, 15))
@@ -143,6 +198,12 @@ class DataFilterApp:
         self.process_button = ttk.Button(actions_frame, text="Process Data", command=self.process_data)
         self.process_button.pack(side=tk.LEFT, padx=5)
         
+        self.preview_button = ttk.Button(actions_frame, text="Preview", command=lambda: self.process_data(preview=True))
+        self.preview_button.pack(side=tk.LEFT, padx=5)
+        
+        self.batch_button = ttk.Button(actions_frame, text="Batch Process...", command=self.process_batch)
+        self.batch_button.pack(side=tk.LEFT, padx=5)
+        
         # Progress indicator
         self.progress = ttk.Progressbar(actions_frame, mode="indeterminate")
         self.progress.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
@@ -210,6 +271,8 @@ class DataFilterApp:
         self.add_to_status(f"Loading columns from sheet: {sheet_name}")
         
         try:
+            from file_utils import read_excel_file
+
             # Load the Excel file and get the column names
             df, error = read_excel_file(self.excel_file_path, sheet_name)
             if error:
@@ -235,11 +298,19 @@ class DataFilterApp:
         except Exception as e:
             self.add_to_status(f"Error loading columns: {str(e)}")
 
-    def process_data(self):
-        """Main processing function."""
+    def process_data(self, preview=False):
+        """
+        Main processing function.
+
+        Args:
+            preview: Analyze a stratified sample first and ask before running the rest
+        """
+        from query import is_query_text
+
         # Get parameters
         filter_column = self.filter_column.get()
-        search_term = self.search_term_entry.get().lower().strip()
+        search_text = self.search_term_entry.get().strip()
+        search_term = search_text.lower()
         sheet_name = self.sheet_name_entry.get().strip() or "Sheet1"
         output_option = self.output_option.get()
         
@@ -248,6 +319,13 @@ class DataFilterApp:
             messagebox.showwarning("Warning", "Please select both Excel and PDF files.")
             return
             
+        if is_query_text(search_text, self.available_columns):
+            if preview:
+                messagebox.showwarning("Warning", "Preview is not available for multi-query searches. Use Process Data instead.")
+                return
+            self.process_queries(search_text, sheet_name)
+            return
+            
         if not filter_column:
             messagebox.showwarning("Warning", "Please select a column to filter by.")
             return
@@ -258,15 +336,23 @@ class DataFilterApp:
 
         # Start progress bar
         self.progress.start()
-        self.process_button.config(state="disabled")
+        self._set_action_buttons("disabled")
+        tracer.reset()
         self.add_to_status(f"Processing data where {filter_column} contains '{search_term}' in sheet: {sheet_name}")
         
         try:
+            from file_utils import save_to_json, save_to_excel, read_excel_file, read_pdf_file
+            from dtype_utils import format_memory_report
+
             # Read Excel file
             self.add_to_status("Reading Excel file...")
             df, error = read_excel_file(self.excel_file_path, sheet_name)
             if error:
                 raise ValueError(error)
+            self.add_to_status(f"Parsed {len(df)} rows with {df.attrs['excel_engine']} engine "
+                               f"in {df.attrs['parse_seconds']:.2f}s")
+            if "memory_report" in df.attrs:
+                self.add_to_status(format_memory_report(df.attrs["memory_report"]))
                 
             if filter_column not in df.columns:
                 raise ValueError(f"Column '{filter_column}' not found in the sheet.")
@@ -291,13 +377,18 @@ class DataFilterApp:
                 
             self.add_to_status("PDF data extracted successfully")
 
-            # Prepare data for AI
-            data_text = filtered_df.to_string(index=False)
+            if preview:
+                response_json = self._preview_then_continue(filtered_df, filter_column, search_term, pdf_text)
+                if response_json is False:
+                    return
+            else:
+                # Prepare data for AI
+                data_text = filtered_df.to_string(index=False)
 
-            # Generate AI response
-            response_json = self.ai_service.analyze_data(
-                search_term, filter_column, pdf_text, data_text
-            )
+                # Generate AI response
+                response_json = self.ai_service.analyze_data(
+                    search_term, filter_column, pdf_text, data_text
+                )
             
             if not response_json:
                 self.add_to_status("Failed to get analyzable response from AI.")
@@ -338,6 +429,172 @@ class DataFilterApp:
         except Exception as e:
             self.add_to_status(f"Error: {str(e)}")
         finally:
+            self._report_trace()
             # Stop progress bar
             self.progress.stop()
-            self.process_button.config(state="normal")
\ No newline at end of file
+            self._set_action_buttons("normal")
+
+    def _preview_then_continue(self, filtered_df, filter_column, search_term, pdf_text):
+        """
+        Analyze a stratified sample, show the projected cost of the full run and
+        ask whether to analyze the remaining rows.
+
+        Returns:
+            list: Response records (None if the AI call failed), or False if the
+            user stopped after the preview
+        """
+        from preview import run_preview, format_preview, continue_full_run
+
+        self.add_to_status("Analyzing a preview sample...")
+        preview = run_preview(self.ai_service, filtered_df, filter_column, search_term, pdf_text)
+        if preview["results"] is None:
+            return None
+
+        lines = format_preview(preview, len(filtered_df))
+        for line in lines:
+            self.add_to_status(line)
+
+        remaining = len(filtered_df) - len(preview["sample"])
+        if remaining == 0:
+            return preview["results"]
+        if not messagebox.askyesno("Preview", "\n".join(lines) + f"\n\nAnalyze the remaining {remaining} records?"):
+            self.add_to_status("Stopped after preview.")
+            return False
+
+        self.add_to_status(f"Analyzing the remaining {remaining} records...")
+        return continue_full_run(self.ai_service, filtered_df, preview, filter_column, search_term, pdf_text)
+
+    def process_queries(self, query_text, sheet_name):
+        """Answer several column=term queries from a single load of the sheet."""
+        from query import parse_queries, evaluate_queries
+
+        try:
+            queries = parse_queries(query_text)
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+
+        self.progress.start()
+        self._set_action_buttons("disabled")
+        tracer.reset()
+        self.add_to_status(f"Processing {len(queries)} queries in sheet: {sheet_name}")
+
+        try:
+            from file_utils import save_query_results, read_excel_file, read_pdf_file
+
+            self.add_to_status("Reading Excel file...")
+            df, error = read_excel_file(self.excel_file_path, sheet_name)
+            if error:
+                raise ValueError(error)
+
+            matched_df, per_query = evaluate_queries(df, queries, self.ai_service)
+            self.add_to_status(f"Found {len(matched_df)} records matching at least one query")
+            for query in queries:
+                self.add_to_status(f"{query['name']} ({query['text']}): {len(per_query[query['name']])} records")
+
+            self.add_to_status("Reading PDF file...")
+            pdf_text, error = read_pdf_file(self.pdf_file_path)
+            if error:
+                raise ValueError(f"Error reading PDF: {error}")
+
+            results = {}
+            for query in queries:
+                query_df = per_query[query["name"]]
+                if query_df.empty:
+                    continue
+                columns = ", ".join(dict.fromkeys(column for column, _ in query["predicates"]))
+                response_json = self.ai_service.analyze_data(
+                    query["text"], columns, pdf_text, query_df.to_string(index=False)
+                )
+                if not response_json:
+                    self.add_to_status(f"{query['name']}: failed to get analyzable response from AI.")
+                    continue
+                results[query["name"]] = {"text": query["text"], "records": response_json}
+
+            if not results:
+                self.add_to_status("No query produced analyzable results.")
+                return
+
+            paths, error = save_query_results(results, self.excel_file_path, sheet_name, matched_df)
+            if error:
+                self.add_to_status(f"Save issue: {error}")
+                return
+            self.output_excel_path, self.output_json_path = paths
+            self.add_to_status(f"Query results saved to: {os.path.basename(paths[0])} and {os.path.basename(paths[1])}")
+            self.add_to_status("Process completed successfully!")
+
+        except Exception as e:
+            self.add_to_status(f"Error: {str(e)}")
+        finally:
+            self._report_trace()
+            self.progress.stop()
+            self._set_action_buttons("normal")
+
+    def process_batch(self):
+        """Process every sheet of several workbooks in parallel into one consolidated output."""
+        filter_column = self.filter_column.get()
+        search_term = self.search_term_entry.get().lower().strip()
+
+        if not self.pdf_file_path:
+            messagebox.showwarning("Warning", "Please select a PDF file.")
+            return
+
+        if not filter_column or not search_term:
+            messagebox.showwarning("Warning", "Please select a filter column and enter a search term.")
+            return
+
+        workbook_paths = filedialog.askopenfilenames(
+            filetypes=[("Excel files", "*.xlsx")],
+            title="Select workbooks to process"
+        )
+        if not workbook_paths:
+            return
+
+        self.progress.start()
+        self._set_action_buttons("disabled")
+        tracer.reset()
+
+        try:
+            from batch import list_jobs, run_batch, save_batch_results
+
+            jobs = list_jobs(workbook_paths)
+            merged_df, errors = run_batch(
+                jobs, filter_column, search_term, self.pdf_file_path, self.ai_service.backend, self
+            )
+            if merged_df is None:
+                self.add_to_status("Batch produced no results.")
+                return
+            self.add_to_status(f"Batch finished: {len(merged_df)} records, {len(errors)} sheet(s) with issues")
+
+            output_excel_path = filedialog.asksaveasfilename(
+                defaultextension=".xlsx",
+                filetypes=[("Excel files", "*.xlsx")],
+                title="Save consolidated batch results",
+                initialfile=f"Batch_by_{filter_column}_Analyzed.xlsx"
+            )
+            if not output_excel_path:
+                self.add_to_status("Operation cancelled.")
+                return
+
+            excel_path, json_path = save_batch_results(merged_df, output_excel_path)
+            self.output_excel_path, self.output_json_path = excel_path, json_path
+            self.add_to_status(f"Batch results saved to: {os.path.basename(excel_path)} and {os.path.basename(json_path)}")
+
+        except Exception as e:
+            self.add_to_status(f"Error: {str(e)}")
+        finally:
+            self._report_trace()
+            self.progress.stop()
+            self._set_action_buttons("normal")
+
+    def _report_trace(self):
+        """Show the timing summary of the last run and export its trace files."""
+        for line in tracer.summary():
+            self.add_to_status(line)
+
+        trace_dir = os.environ.get("ANALYZER_TRACE_DIR", "traces")
+        try:
+            json_path, prom_path = tracer.export(trace_dir)
+            self.add_to_status(f"Trace saved to: {json_path} (metrics: {os.path.basename(prom_path)})")
+        except Exception as e:
+            self.add_to_status(f"Could not export trace: {str(e)}")
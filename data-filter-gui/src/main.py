@@ -6,11 +6,16 @@ import tkinter as tk
 from ttkthemes import ThemedTk  # type: ignore
 from gui import DataFilterApp
 
-def main():
-    """Application entry point."""
+def create_app():
+    """Create the root window and the application; heavy modules load after the first paint."""
     # Use ThemedTk for better looking UI
     root = ThemedTk(theme="equilux")  # You can use other themes like: 'breeze', 'equilux', 'arc', etc.
     app = DataFilterApp(root)
+    return root, app
+
+def main():
+    """Application entry point."""
+    root, app = create_app()
     root.mainloop()
 
 if __name__ == "__main__":
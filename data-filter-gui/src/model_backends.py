@@ -0,0 +1,319 @@
+"""
+Model backends for the AI Medical Data Analyzer Application.
+AIService talks to the model through one of these backends, so the live
+Gemini API can be swapped for a deterministic local stand-in when
+benchmarking or working offline.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+# Pinned version: context caching needs an explicitly versioned model, and
+# cached and inline requests must be answered by the same model
+DEFAULT_MODEL = "gemini-1.5-flash-001"
+
+CACHED_CONTEXT_INSTRUCTION = (
+    "You are a professional AI assistant specialized in medical data analysis. "
+    "The cached content is the clinical guideline document to apply to every request."
+)
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class GeminiBackend:
+    """Backend that sends requests to the Gemini API."""
+
+    def __init__(self):
+        self._genai = None
+
+    def _module(self):
+        if self._genai is None:
+            import google.generativeai as genai  # type: ignore
+            self._genai = genai
+        return self._genai
+
+    def configure(self, api_key):
+        """Configure the Gemini API with the provided key."""
+        self._module().configure(api_key=api_key)
+
+    def generate(self, prompt, model_name=DEFAULT_MODEL, cached_context=None):
+        """
+        Send a prompt to Gemini.
+
+        Args:
+            prompt: Prompt text
+            model_name: Gemini model to use
+            cached_context: Handle from create_cached_context to prepend, if any
+
+        Returns:
+            Response object with `text` and `usage_metadata` attributes
+        """
+        genai = self._module()
+        if cached_context is not None:
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached_context["cache"])
+        else:
+            model = genai.GenerativeModel(model_name)
+        return model.generate_content(prompt)
+
+    def create_cached_context(self, text, model_name, ttl_seconds):
+        """
+        Upload text to Gemini's context cache.
+
+        Returns:
+            dict: Handle with "name", "expires" and the SDK "cache" object
+        """
+        import datetime
+        cache = self._module().caching.CachedContent.create(
+            model=f"models/{model_name}",
+            system_instruction=CACHED_CONTEXT_INSTRUCTION,
+            contents=[text],
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+        return {"name": cache.name, "expires": time.time() + ttl_seconds, "cache": cache}
+
+    def refresh_cached_context(self, handle, ttl_seconds):
+        """Extend the TTL of a cached context."""
+        import datetime
+        handle["cache"].update(ttl=datetime.timedelta(seconds=ttl_seconds))
+        return dict(handle, expires=time.time() + ttl_seconds)
+
+
+def create_backend(mock=False):
+    """
+    Build the backend for a command-line tool.
+
+    Args:
+        mock: Use MockGeminiBackend instead of the live API
+
+    Returns:
+        A configured backend
+
+    Raises:
+        SystemExit: If GEMINI_API_KEY is not set for the live API
+    """
+    if mock:
+        return MockGeminiBackend()
+
+    from dotenv import load_dotenv  # type: ignore
+    load_dotenv()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise SystemExit("GEMINI_API_KEY is not set.")
+    backend = GeminiBackend()
+    backend.configure(api_key)
+    return backend
+
+
+class ConcurrencyLimitedBackend:
+    """
+    Wraps another backend so that at most max_concurrent requests are in
+    flight at once, however many threads share it.
+
+    Args:
+        backend: Backend to delegate to
+        max_concurrent: Maximum simultaneous generate calls
+    """
+
+    def __init__(self, backend, max_concurrent=4):
+        self.backend = backend
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def configure(self, api_key):
+        """Configure the wrapped backend."""
+        self.backend.configure(api_key)
+
+    def generate(self, prompt, model_name=DEFAULT_MODEL, **kwargs):
+        """Send a prompt through the wrapped backend once a slot is free."""
+        with self._semaphore:
+            return self.backend.generate(prompt, model_name, **kwargs)
+
+    def __getattr__(self, name):
+        # Expose optional capabilities (e.g. context caching) of the wrapped backend
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+
+class MockRateLimitError(Exception):
+    """Raised by MockGeminiBackend to simulate an HTTP 429 from the API."""
+
+    code = 429
+
+    def __init__(self, message="429 Resource has been exhausted (mock)"):
+        super().__init__(message)
+
+
+class MockCachedContextNotFound(Exception):
+    """Raised by MockGeminiBackend for an unknown or expired cached context."""
+
+    code = 404
+
+
+class MockGeminiBackend:
+    """
+    Local stand-in for Gemini that returns deterministic JSON responses.
+
+    Args:
+        latency: Fixed seconds added to every request (time to first token)
+        tokens_per_second: Simulated output speed; 0 disables the delay
+        rate_limit_rate: Fraction of requests that raise MockRateLimitError
+        malformed_rate: Fraction of responses returned as broken JSON
+        seed: Seed for the injection random generator
+        prefill_tokens_per_second: Simulated input processing speed, which
+            adds to time to first token for uncached input; 0 disables it
+    """
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0, rate_limit_rate=0.0,
+                 malformed_rate=0.0, seed=0, prefill_tokens_per_second=0.0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._contexts = {}
+        self.calls = 0
+
+    def configure(self, api_key):
+        """The stand-in accepts any key."""
+
+    def create_cached_context(self, text, model_name, ttl_seconds):
+        """
+        Store text as a cached context.
+
+        Returns:
+            dict: Handle with "name" and "expires"
+        """
+        with self._lock:
+            name = f"cachedContents/mock-{len(self._contexts) + 1}"
+            expires = time.time() + ttl_seconds
+            self._contexts[name] = {"tokens": estimate_tokens(text), "expires": expires}
+        if self.prefill_tokens_per_second:
+            # The upload is processed once, at creation time
+            time.sleep(estimate_tokens(text) / self.prefill_tokens_per_second)
+        return {"name": name, "expires": expires}
+
+    def refresh_cached_context(self, handle, ttl_seconds):
+        """Extend the TTL of a cached context."""
+        with self._lock:
+            context = self._contexts.get(handle["name"])
+            if context is None:
+                raise MockCachedContextNotFound(f"404 {handle['name']} not found (mock)")
+            context["expires"] = time.time() + ttl_seconds
+        return dict(handle, expires=context["expires"])
+
+    def generate(self, prompt, model_name=DEFAULT_MODEL, cached_context=None):
+        """
+        Produce a deterministic response for a prompt.
+
+        Args:
+            prompt: Prompt text
+            model_name: Ignored; kept for interface compatibility
+            cached_context: Handle from create_cached_context, if any
+
+        Returns:
+            Response object with `text` and `usage_metadata` attributes
+        """
+        with self._lock:
+            self.calls += 1
+            rate_limited = self._random.random() < self.rate_limit_rate
+            malformed = self._random.random() < self.malformed_rate
+            cached_tokens = 0
+            if cached_context is not None:
+                context = self._contexts.get(cached_context["name"])
+                if context is None or context["expires"] < time.time():
+                    raise MockCachedContextNotFound(f"404 {cached_context['name']} not found (mock)")
+                cached_tokens = context["tokens"]
+
+        prompt_tokens = estimate_tokens(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.prefill_tokens_per_second:
+            time.sleep(prompt_tokens / self.prefill_tokens_per_second)
+        if rate_limited:
+            raise MockRateLimitError()
+
+        text = self._respond(prompt)
+        if malformed:
+            text = text[: len(text) // 2]
+
+        response_tokens = estimate_tokens(text)
+        if self.tokens_per_second:
+            time.sleep(response_tokens / self.tokens_per_second)
+
+        # Like Gemini, prompt_token_count includes the cached tokens
+        usage = SimpleNamespace(
+            prompt_token_count=prompt_tokens + cached_tokens,
+            cached_content_token_count=cached_tokens,
+            candidates_token_count=response_tokens,
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def _respond(self, prompt):
+        if "Term groups:" in prompt:
+            return self._respond_batch_filter(prompt)
+        if "Values to check:" in prompt:
+            return self._respond_filter(prompt)
+        if "Filtered Data:" in prompt:
+            return self._respond_analysis(prompt)
+        return json.dumps({"response": "OK"})
+
+    def _respond_filter(self, prompt):
+        term_match = re.search(r'records related to "(.*?)"', prompt)
+        search_term = term_match.group(1).lower() if term_match else ""
+        values_text = prompt.split("Values to check:", 1)[1].strip()
+        try:
+            values = ast.literal_eval(values_text)
+        except (ValueError, SyntaxError):
+            values = []
+        matches = [value for value in values if search_term and search_term in str(value).lower()]
+        return json.dumps({
+            "matches": matches,
+            "explanation": f"Mock backend matched values containing '{search_term}'.",
+        })
+
+    def _respond_batch_filter(self, prompt):
+        groups_text = prompt.split("Term groups:", 1)[1].strip()
+        try:
+            groups = json.loads(groups_text)
+        except ValueError:
+            groups = []
+        results = []
+        for group in groups:
+            term = str(group.get("term", "")).lower()
+            matches = [value for value in group.get("values", []) if term and term in str(value).lower()]
+            results.append({"id": group.get("id"), "matches": matches})
+        return json.dumps({
+            "results": results,
+            "explanation": "Mock backend matched values containing each term.",
+        })
+
+    def _respond_analysis(self, prompt):
+        data_text = prompt.split("Filtered Data:", 1)[1]
+        data_text = data_text.split("Provide the response in", 1)[0]
+        lines = [line.strip() for line in data_text.strip().splitlines() if line.strip()]
+        header, rows = (lines[0], lines[1:]) if lines else ("", [])
+
+        records = []
+        for row in rows:
+            # Hash the row so the verdict is stable across runs
+            digest = hashlib.md5(row.encode("utf-8")).digest()
+            meets = digest[0] % 2 == 0
+            records.append({
+                "Record": row,
+                "Meets Guidelines": "True" if meets else "False",
+                "Notes on Compliance": f"Mock verdict for columns: {header}",
+            })
+        return json.dumps(records, indent=2)
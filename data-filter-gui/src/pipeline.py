@@ -0,0 +1,82 @@
+"""
+Headless analysis pipeline for the AI Medical Data Analyzer Application.
+Runs the same read -> filter -> analyze steps as the GUI without Tkinter,
+for benchmarks and other non-interactive callers.
+"""
+
+import pandas as pd  # type: ignore
+
+from file_utils import read_excel_file, read_pdf_file
+
+
+class HeadlessApp:
+    """Minimal stand-in for DataFilterApp that collects status messages."""
+
+    def __init__(self, echo=False, keep_messages=True):
+        self.echo = echo
+        self.keep_messages = keep_messages
+        self.messages = []
+
+    def add_to_status(self, message):
+        """Record a status message (and print it when echo is enabled)."""
+        if self.keep_messages:
+            self.messages.append(message)
+        if self.echo:
+            print(message)
+
+
+def run_analysis(ai_service, excel_file_path, sheet_name, filter_column, search_term, pdf_file_path):
+    """
+    Run the full analysis for one sheet, mirroring DataFilterApp.process_data
+    without the save dialogs.
+
+    Args:
+        ai_service: Configured AIService instance
+        excel_file_path: Path to the Excel file
+        sheet_name: Name of the sheet to read
+        filter_column: Column to filter by
+        search_term: Term to search for
+        pdf_file_path: Path to the guideline PDF
+
+    Returns:
+        tuple: (response DataFrame or None, error message or None)
+    """
+    df, error = read_excel_file(excel_file_path, sheet_name)
+    if error:
+        return None, error
+
+    pdf_text, error = read_pdf_file(pdf_file_path)
+    if error:
+        return None, f"Error reading PDF: {error}"
+
+    return analyze_dataframe(ai_service, df, filter_column, search_term, pdf_text)
+
+
+def analyze_dataframe(ai_service, df, filter_column, search_term, pdf_text):
+    """
+    Filter an already loaded sheet and analyze the matches against the guideline text.
+
+    Args:
+        ai_service: Configured AIService instance
+        df: Loaded sheet
+        filter_column: Column to filter by
+        search_term: Term to search for
+        pdf_text: Extracted guideline text
+
+    Returns:
+        tuple: (response DataFrame or None, error message or None)
+    """
+    if filter_column not in df.columns:
+        return None, f"Column '{filter_column}' not found in the sheet."
+
+    filtered_df = ai_service.ai_assisted_filter(df, filter_column, search_term)
+    if filtered_df.empty:
+        return None, f"No data found where {filter_column} contains '{search_term}'."
+    filtered_df = filtered_df.reset_index(drop=True)
+
+    data_text = filtered_df.to_string(index=False)
+    response_json = ai_service.analyze_data(search_term, filter_column, pdf_text, data_text)
+    if not response_json:
+        return None, "Failed to get analyzable response from AI."
+
+    return pd.DataFrame(response_json), None
@@ -0,0 +1,151 @@
+"""
+Preview mode for the AI Medical Data Analyzer Application.
+
+Analyzes a small sample of the filtered rows, stratified by the filter
+column's values, and projects the time and tokens of the full run. The
+sample's results are reused if the user goes on to analyze the rest.
+"""
+
+import time
+
+import pandas as pd  # type: ignore
+
+from model_backends import estimate_tokens
+from tracing import tracer
+
+
+DEFAULT_SAMPLE_SIZE = 25
+
+
+def stratified_sample(df, column, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+    """
+    Draw a sample with every value of a column represented in proportion.
+
+    Each distinct value gets at least one row (while the sample size allows),
+    and the rest of the sample is shared out by group size.
+
+    Args:
+        df: Rows to sample from
+        column: Column to stratify by
+        sample_size: Target number of rows
+        seed: Random seed
+
+    Returns:
+        DataFrame: Sampled rows, keeping their original index
+    """
+    if len(df) <= sample_size:
+        return df
+
+    group_sizes = df.groupby(column, observed=True, dropna=False).size().sort_values(ascending=False)
+    allocation = {}
+    remaining = sample_size
+    for value in group_sizes.index:
+        if remaining == 0:
+            break
+        allocation[value] = 1
+        remaining -= 1
+    for value, size in group_sizes.items():
+        if remaining == 0:
+            break
+        extra = min(int(sample_size * size / len(df)), size - allocation.get(value, 0), remaining)
+        if value in allocation and extra > 0:
+            allocation[value] += extra
+            remaining -= extra
+
+    samples = []
+    for value, group in df.groupby(column, observed=True, dropna=False):
+        count = allocation.get(value, 0)
+        if count:
+            samples.append(group.sample(n=count, random_state=seed))
+    return pd.concat(samples).sort_index()
+
+
+def _generation_tokens():
+    stats = tracer.stage_totals().get("generate_content", {})
+    return stats.get("prompt_tokens", 0), stats.get("response_tokens", 0)
+
+
+def run_preview(ai_service, filtered_df, filter_column, search_term, pdf_text,
+                sample_size=DEFAULT_SAMPLE_SIZE):
+    """
+    Analyze a stratified sample and project the cost of the full run.
+
+    Args:
+        ai_service: Configured AIService instance
+        filtered_df: All rows the full run would analyze
+        filter_column: Column the rows were filtered by (used for stratification)
+        search_term: Term to search for
+        pdf_text: Extracted guideline text
+        sample_size: Number of rows to analyze now
+
+    Returns:
+        dict: "sample" (rows analyzed), "results" (response records or None),
+        "seconds", "projected_seconds", "projected_prompt_tokens",
+        "projected_response_tokens"
+    """
+    with tracer.span("preview", rows=len(filtered_df), sample_size=sample_size):
+        sample = stratified_sample(filtered_df, filter_column, sample_size)
+        sample_text = sample.to_string(index=False)
+
+        prompt_before, response_before = _generation_tokens()
+        started = time.perf_counter()
+        results = ai_service.analyze_data(search_term, filter_column, pdf_text, sample_text)
+        seconds = time.perf_counter() - started
+        prompt_tokens, response_tokens = _generation_tokens()
+        prompt_tokens -= prompt_before
+        response_tokens -= response_before
+
+        # Output and time scale with rows; the prompt only grows by the extra data
+        scale = len(filtered_df) / max(1, len(sample))
+        if not prompt_tokens:
+            prompt_tokens = estimate_tokens(pdf_text) + estimate_tokens(sample_text)
+        if not response_tokens:
+            response_tokens = estimate_tokens(str(results or ""))
+        full_data_tokens = estimate_tokens(filtered_df.to_string(index=False))
+
+        return {
+            "sample": sample,
+            "results": results,
+            "seconds": seconds,
+            "projected_seconds": seconds * scale,
+            "projected_prompt_tokens": prompt_tokens - estimate_tokens(sample_text) + full_data_tokens,
+            "projected_response_tokens": int(response_tokens * scale),
+        }
+
+
+def format_preview(preview, total_rows):
+    """
+    Summarize a preview for the status box.
+
+    Returns:
+        list: Status lines
+    """
+    lines = [f"Preview analyzed {len(preview['sample'])} of {total_rows} records in {preview['seconds']:.1f}s"]
+    if preview["results"]:
+        meets = sum(1 for item in preview["results"] if item.get("Meets Guidelines") is True)
+        lines.append(f"Sample: {meets} of {len(preview['results'])} records meet the guidelines")
+    lines.append(
+        f"Projected full run: ~{preview['projected_seconds']:.0f}s, "
+        f"~{preview['projected_prompt_tokens']} input / ~{preview['projected_response_tokens']} output tokens"
+    )
+    return lines
+
+
+def continue_full_run(ai_service, filtered_df, preview, filter_column, search_term, pdf_text):
+    """
+    Analyze the rows the preview did not cover and merge them with the preview results.
+
+    Returns:
+        list: Response records for every row, or None if the AI call failed
+    """
+    remaining = filtered_df.drop(index=preview["sample"].index)
+    if remaining.empty:
+        return preview["results"]
+
+    with tracer.span("continue_full_run", rows=len(remaining)):
+        results = ai_service.analyze_data(
+            search_term, filter_column, pdf_text, remaining.to_string(index=False)
+        )
+    if results is None:
+        return None
+    return list(preview["results"] or []) + results
@@ -0,0 +1,130 @@
+"""
+Multi-question query mode for the AI Medical Data Analyzer Application.
+
+Several queries are answered from one load of the sheet. Each query is a
+set of column=term predicates joined with AND or OR; queries are separated
+by ";" or new lines, e.g.:
+
+    DiseaseName=diabetes AND Medication=metformin; DiseaseName=asthma
+"""
+
+import re
+
+import pandas as pd  # type: ignore
+
+from tracing import tracer
+
+
+# Column added to the matched rows listing the queries each row satisfied
+MATCHED_QUERIES_COLUMN = "Matched Queries"
+
+_COMBINE_PATTERN = re.compile(r"\s+(AND|OR)\s+", re.IGNORECASE)
+
+
+def is_query_text(text, columns):
+    """
+    Return True if the search text uses query syntax rather than a plain term.
+
+    A term only counts as a query when the left side of its first "=" names
+    one of the sheet's columns, so plain terms containing "=" still work.
+
+    Args:
+        text: Search text entered by the user
+        columns: Column names of the loaded sheet
+    """
+    if "=" not in text:
+        return False
+    column_name = _COMBINE_PATTERN.split(re.split(r"[;\n]", text.strip(), maxsplit=1)[0])[0].split("=", 1)[0]
+    return column_name.strip() in set(columns)
+
+
+def parse_queries(text):
+    """
+    Parse query text into query definitions.
+
+    Args:
+        text: Queries separated by ";" or new lines
+
+    Returns:
+        list: Dicts with "name" (Q1, Q2...), "text", "combine" ("AND"/"OR")
+        and "predicates" (list of (column, term) tuples)
+
+    Raises:
+        ValueError: If a query is malformed or mixes AND and OR
+    """
+    queries = []
+    for raw_query in re.split(r"[;\n]", text):
+        raw_query = raw_query.strip()
+        if not raw_query:
+            continue
+
+        parts = _COMBINE_PATTERN.split(raw_query)
+        operators = {operator.upper() for operator in parts[1::2]}
+        if len(operators) > 1:
+            raise ValueError(f"Query '{raw_query}' mixes AND and OR; split it into separate queries.")
+
+        predicates = []
+        for predicate in parts[0::2]:
+            if "=" not in predicate:
+                raise ValueError(f"Expected column=term in '{predicate.strip()}'.")
+            column_name, term = predicate.split("=", 1)
+            column_name, term = column_name.strip(), term.strip().lower()
+            if not column_name or not term:
+                raise ValueError(f"Expected column=term in '{predicate.strip()}'.")
+            predicates.append((column_name, term))
+
+        queries.append({
+            "name": f"Q{len(queries) + 1}",
+            "text": raw_query,
+            "combine": operators.pop() if operators else "AND",
+            "predicates": predicates,
+        })
+    if not queries:
+        raise ValueError("No queries found.")
+    return queries
+
+
+def evaluate_queries(df, queries, ai_service):
+    """
+    Evaluate every query against a dataframe in one pass.
+
+    All predicates are resolved together (one batched AI request at most),
+    then combined with vectorized boolean operations.
+
+    Args:
+        df: Loaded sheet
+        queries: Output of parse_queries
+        ai_service: AIService used to resolve the predicates
+
+    Returns:
+        tuple: (matched rows tagged with MATCHED_QUERIES_COLUMN,
+        dict of query name -> rows matching that query)
+    """
+    with tracer.span("evaluate_queries", queries=len(queries), rows=len(df)):
+        predicates = [predicate for query in queries for predicate in query["predicates"]]
+        masks = ai_service.resolve_predicates(df, predicates)
+
+        query_masks = {}
+        for query in queries:
+            combined = None
+            for predicate in query["predicates"]:
+                mask = masks[predicate]
+                if combined is None:
+                    combined = mask
+                elif query["combine"] == "OR":
+                    combined = combined | mask
+                else:
+                    combined = combined & mask
+            query_masks[query["name"]] = combined
+
+        mask_frame = pd.DataFrame(query_masks)
+        any_match = mask_frame.any(axis=1)
+        matched = df[any_match].copy()
+        matched_masks = mask_frame[any_match]
+        tags = pd.Series("", index=matched.index)
+        for name in query_masks:
+            tags = tags + matched_masks[name].map({True: f"{name}, ", False: ""})
+        matched[MATCHED_QUERIES_COLUMN] = tags.str.rstrip(", ")
+
+        per_query = {name: df[mask] for name, mask in query_masks.items()}
+        return matched, per_query
@@ -0,0 +1,200 @@
+"""
+Synthetic test data for the AI Medical Data Analyzer Application.
+Generates realistic-looking medical workbooks and guideline PDFs of
+configurable size for benchmarks and manual testing. No real patient
+data is involved.
+
+Usage:
+    python synthetic_data.py workbook out.xlsx --rows 100000 --diseases 50
+    python synthetic_data.py pdf guidelines.pdf --pages 300
+"""
+
+import argparse
+
+import fitz  # type: ignore
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+
+# Excel's hard limit on rows per sheet, including the header row
+EXCEL_MAX_ROWS = 1048575
+
+BASE_DISEASES = [
+    "Diabetes Mellitus Type 2", "Diabetes Mellitus Type 1", "Hypertension",
+    "Asthma", "COPD", "Heart Failure", "Atrial Fibrillation", "Chronic Kidney Disease",
+    "Hypothyroidism", "Major Depressive Disorder", "Osteoarthritis", "Migraine",
+    "Pneumonia", "Hyperlipidemia", "Coronary Artery Disease", "Anemia",
+]
+
+MEDICATIONS = [
+    "Metformin", "Insulin Glargine", "Lisinopril", "Amlodipine", "Salbutamol",
+    "Tiotropium", "Furosemide", "Apixaban", "Levothyroxine", "Sertraline",
+    "Paracetamol", "Sumatriptan", "Amoxicillin", "Atorvastatin", "Aspirin",
+    "Ferrous Sulfate",
+]
+
+WORDS = (
+    "patient presented with stable symptoms follow up advised review medication "
+    "adherence laboratory results within normal limits dose adjusted referral "
+    "considered lifestyle counselling provided monitoring continued"
+).split()
+
+
+def disease_names(cardinality):
+    """
+    Build a list of distinct disease names.
+
+    Args:
+        cardinality: Number of distinct names wanted
+
+    Returns:
+        list: Disease names, starting with the common base set
+    """
+    names = list(BASE_DISEASES[:cardinality])
+    variant = 1
+    while len(names) < cardinality:
+        for base in BASE_DISEASES:
+            if len(names) >= cardinality:
+                break
+            names.append(f"{base} (variant {variant})")
+        variant += 1
+    return names
+
+
+def generate_dataframe(rows, disease_cardinality=16, text_width=60, duplicate_ratio=0.0, seed=0):
+    """
+    Generate a synthetic medical records dataframe.
+
+    Args:
+        rows: Number of rows
+        disease_cardinality: Number of distinct DiseaseName values
+        text_width: Approximate character width of the free-text Notes column
+        duplicate_ratio: Fraction of rows that are exact copies of other rows
+        seed: Random seed, so the same arguments always give the same data
+
+    Returns:
+        DataFrame: Columns PatientID, Age, Sex, DiseaseName, Medication, DoseMg,
+        VisitDate, Notes
+    """
+    rng = np.random.default_rng(seed)
+    unique_rows = max(1, int(rows * (1 - duplicate_ratio)))
+
+    diseases = np.array(disease_names(disease_cardinality), dtype=object)
+    medications = np.array(MEDICATIONS, dtype=object)
+    words = np.array(WORDS, dtype=object)
+
+    # Skew disease frequencies so a few conditions dominate, as in real intake
+    weights = 1.0 / np.arange(1, len(diseases) + 1)
+    weights /= weights.sum()
+
+    words_per_note = max(1, text_width // 8)
+    note_words = rng.choice(words, size=(unique_rows, words_per_note))
+    notes = [" ".join(row)[:text_width] for row in note_words]
+
+    df = pd.DataFrame({
+        "PatientID": np.arange(1, unique_rows + 1),
+        "Age": rng.integers(18, 95, size=unique_rows),
+        "Sex": rng.choice(np.array(["F", "M"], dtype=object), size=unique_rows),
+        "DiseaseName": rng.choice(diseases, size=unique_rows, p=weights),
+        "Medication": rng.choice(medications, size=unique_rows),
+        "DoseMg": rng.choice([5.0, 10.0, 20.0, 40.0, 250.0, 500.0, 1000.0], size=unique_rows),
+        "VisitDate": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, size=unique_rows), unit="D"),
+        "Notes": notes,
+    })
+
+    if rows > unique_rows:
+        duplicates = df.iloc[rng.integers(0, unique_rows, size=rows - unique_rows)]
+        df = pd.concat([df, duplicates], ignore_index=True)
+        df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+    return df
+
+
+def write_workbook(path, rows, sheet_name="Sheet1", **kwargs):
+    """
+    Generate a dataframe and write it to an Excel workbook.
+
+    Args:
+        path: Destination .xlsx path
+        rows: Number of data rows (capped at the Excel sheet limit)
+        sheet_name: Name of the sheet to create
+        **kwargs: Passed through to generate_dataframe
+
+    Returns:
+        DataFrame: The data that was written
+    """
+    df = generate_dataframe(min(rows, EXCEL_MAX_ROWS), **kwargs)
+    df.to_excel(path, sheet_name=sheet_name, index=False)
+    return df
+
+
+def write_guideline_pdf(path, pages, disease_cardinality=16, seed=0):
+    """
+    Write a multi-page guideline PDF with one section per disease.
+
+    Args:
+        path: Destination .pdf path
+        pages: Number of pages
+        disease_cardinality: Number of diseases the guideline covers
+        seed: Random seed for the body text
+
+    Returns:
+        str: The path written
+    """
+    rng = np.random.default_rng(seed)
+    diseases = disease_names(disease_cardinality)
+
+    pdf_document = fitz.open()
+    for page_number in range(pages):
+        disease = diseases[page_number % len(diseases)]
+        medication = MEDICATIONS[page_number % len(MEDICATIONS)]
+        lines = [
+            f"Section {page_number + 1}: {disease}",
+            "",
+            f"Recommended first-line therapy for {disease} is {medication}.",
+            "Review the patient at least every three months and record adherence.",
+            "",
+        ]
+        for _ in range(40):
+            lines.append(" ".join(rng.choice(WORDS, size=12)))
+
+        page = pdf_document.new_page()
+        page.insert_text((50, 60), "\n".join(lines), fontsize=9)
+    pdf_document.save(path)
+    pdf_document.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic medical test data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    workbook = subparsers.add_parser("workbook", help="Write a synthetic Excel workbook")
+    workbook.add_argument("path")
+    workbook.add_argument("--rows", type=int, default=10000)
+    workbook.add_argument("--sheet-name", default="Sheet1")
+    workbook.add_argument("--diseases", type=int, default=16, help="DiseaseName cardinality")
+    workbook.add_argument("--text-width", type=int, default=60, help="Width of the Notes column")
+    workbook.add_argument("--duplicate-ratio", type=float, default=0.0)
+    workbook.add_argument("--seed", type=int, default=0)
+
+    pdf = subparsers.add_parser("pdf", help="Write a synthetic guideline PDF")
+    pdf.add_argument("path")
+    pdf.add_argument("--pages", type=int, default=100)
+    pdf.add_argument("--diseases", type=int, default=16)
+    pdf.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "workbook":
+        df = write_workbook(
+            args.path, args.rows, sheet_name=args.sheet_name,
+            disease_cardinality=args.diseases, text_width=args.text_width,
+            duplicate_ratio=args.duplicate_ratio, seed=args.seed,
+        )
+        print(f"Wrote {len(df)} rows to {args.path}")
+    else:
+        write_guideline_pdf(args.path, args.pages, disease_cardinality=args.diseases, seed=args.seed)
+        print(f"Wrote {args.pages} pages to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
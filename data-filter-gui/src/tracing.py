@@ -0,0 +1,282 @@
+"""
+Tracing utilities for the AI Medical Data Analyzer Application.
+Records timed spans around each pipeline stage and exports them as a
+JSON trace file and a Prometheus text-format metrics file.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+class Tracer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Discard all recorded spans and start a new trace."""
+        with self._lock:
+            self.spans = []
+            self.trace_start = time.time()
+            self._next_id = 1
+
+    def take_spans(self, thread_name=None):
+        """
+        Remove and return recorded spans, so long-running processes do not
+        accumulate them.
+
+        Args:
+            thread_name: Only take spans recorded by this thread (default: all)
+
+        Returns:
+            list: The removed span records
+        """
+        with self._lock:
+            if thread_name is None:
+                taken, self.spans = self.spans, []
+            else:
+                taken = [record for record in self.spans if record["thread"] == thread_name]
+                self.spans = [record for record in self.spans if record["thread"] != thread_name]
+        return taken
+
+    def merge_spans(self, spans, trace_start):
+        """
+        Add spans recorded by another tracer (e.g. in a worker process),
+        giving them fresh ids and shifting their start times onto this trace.
+
+        Args:
+            spans: Span records, e.g. from take_spans
+            trace_start: trace_start of the tracer that recorded them
+        """
+        with self._lock:
+            offset = trace_start - self.trace_start
+            new_ids = {}
+            for record in spans:
+                new_ids[record["id"]] = self._next_id
+                self._next_id += 1
+            for record in spans:
+                self.spans.append(dict(
+                    record,
+                    id=new_ids[record["id"]],
+                    parent_id=new_ids.get(record["parent_id"]),
+                    start=record["start"] + offset,
+                ))
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a block of code as a named span.
+
+        Args:
+            name: Stage name (e.g. "read_excel_file")
+            **attributes: Extra values stored with the span
+
+        Yields:
+            dict: The span record; callers may add attributes while it runs
+        """
+        stack = self._stack()
+        with self._lock:
+            span_id = self._next_id
+            self._next_id += 1
+
+        record = {
+            "id": span_id,
+            "parent_id": stack[-1]["id"] if stack else None,
+            "name": name,
+            "thread": threading.current_thread().name,
+            "start": time.time() - self.trace_start,
+            "duration": None,
+            "status": "ok",
+            "attributes": dict(attributes),
+        }
+        stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["status"] = "error"
+            record["attributes"]["error"] = str(e)
+            raise
+        finally:
+            record["duration"] = time.perf_counter() - started
+            stack.pop()
+            with self._lock:
+                self.spans.append(record)
+
+    def stage_totals(self):
+        """
+        Aggregate recorded spans by name.
+
+        Returns:
+            dict: name -> {"count", "total", "max", "errors", "prompt_tokens", "cached_tokens", "response_tokens"}
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            stats = totals.setdefault(record["name"], {
+                "count": 0, "total": 0.0, "max": 0.0, "errors": 0,
+                "prompt_tokens": 0, "cached_tokens": 0, "response_tokens": 0,
+            })
+            stats["count"] += 1
+            stats["total"] += record["duration"]
+            stats["max"] = max(stats["max"], record["duration"])
+            if record["status"] == "error":
+                stats["errors"] += 1
+            stats["prompt_tokens"] += record["attributes"].get("prompt_tokens") or 0
+            stats["cached_tokens"] += record["attributes"].get("cached_tokens") or 0
+            stats["response_tokens"] += record["attributes"].get("response_tokens") or 0
+        return totals
+
+    def summary(self):
+        """
+        Build a human readable summary of the current trace.
+
+        Returns:
+            list: Lines suitable for the status box
+        """
+        totals = self.stage_totals()
+        if not totals:
+            return ["No trace data recorded."]
+
+        lines = ["Timing summary:"]
+        for name, stats in sorted(totals.items(), key=lambda item: item[1]["total"], reverse=True):
+            line = f"  {name}: {stats['total']:.3f}s over {stats['count']} call(s)"
+            if stats["prompt_tokens"] or stats["response_tokens"]:
+                line += f", tokens in/out {stats['prompt_tokens']}/{stats['response_tokens']}"
+            if stats["cached_tokens"]:
+                line += f" ({stats['cached_tokens']} cached)"
+            if stats["errors"]:
+                line += f", {stats['errors']} error(s)"
+            lines.append(line)
+        return lines
+
+    def export_json(self, path):
+        """
+        Write the recorded spans to a JSON trace file.
+
+        Args:
+            path: Destination file path
+
+        Returns:
+            str: The path written
+        """
+        with self._lock:
+            payload = {
+                "trace_start": self.trace_start,
+                "spans": sorted(self.spans, key=lambda record: record["start"]),
+            }
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(payload, trace_file, indent=4, default=str)
+        return path
+
+    def export_prometheus(self, path):
+        """
+        Write aggregated stage metrics in Prometheus text exposition format.
+
+        Args:
+            path: Destination file path
+
+        Returns:
+            str: The path written
+        """
+        totals = self.stage_totals()
+        lines = [
+            "# HELP analyzer_stage_duration_seconds Time spent in each pipeline stage.",
+            "# TYPE analyzer_stage_duration_seconds summary",
+        ]
+        for name, stats in totals.items():
+            lines.append(f'analyzer_stage_duration_seconds_sum{{stage="{name}"}} {stats["total"]:.6f}')
+            lines.append(f'analyzer_stage_duration_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines += [
+            "# HELP analyzer_stage_duration_seconds_max Longest single call of each pipeline stage.",
+            "# TYPE analyzer_stage_duration_seconds_max gauge",
+        ]
+        for name, stats in totals.items():
+            lines.append(f'analyzer_stage_duration_seconds_max{{stage="{name}"}} {stats["max"]:.6f}')
+        lines += [
+            "# HELP analyzer_stage_errors_total Failed calls of each pipeline stage.",
+            "# TYPE analyzer_stage_errors_total counter",
+        ]
+        for name, stats in totals.items():
+            lines.append(f'analyzer_stage_errors_total{{stage="{name}"}} {stats["errors"]}')
+        lines += [
+            "# HELP analyzer_tokens_total Model tokens used per stage.",
+            "# TYPE analyzer_tokens_total counter",
+        ]
+        for name, stats in totals.items():
+            if stats["prompt_tokens"] or stats["response_tokens"]:
+                lines.append(f'analyzer_tokens_total{{stage="{name}",direction="prompt"}} {stats["prompt_tokens"]}')
+                lines.append(f'analyzer_tokens_total{{stage="{name}",direction="cached"}} {stats["cached_tokens"]}')
+                lines.append(f'analyzer_tokens_total{{stage="{name}",direction="response"}} {stats["response_tokens"]}')
+
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write("\n".join(lines) + "\n")
+        return path
+
+    def export(self, output_dir, run_name="run"):
+        """
+        Export both the JSON trace and the Prometheus metrics into a directory.
+
+        Args:
+            output_dir: Directory to write into (created if missing)
+            run_name: Prefix for the file names
+
+        Returns:
+            tuple: (json_path, prometheus_path)
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.trace_start))
+        json_path = os.path.join(output_dir, f"{run_name}_{stamp}_trace.json")
+        prom_path = os.path.join(output_dir, f"{run_name}_{stamp}_metrics.prom")
+        return self.export_json(json_path), self.export_prometheus(prom_path)
+
+
+def record_token_usage(record, response):
+    """
+    Copy token counts from a Gemini response onto a span record.
+
+    Args:
+        record: Span record yielded by Tracer.span
+        response: Response object returned by generate_content
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    # prompt_tokens counts only input sent with this request, not cached context
+    cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+    record["attributes"]["prompt_tokens"] = (getattr(usage, "prompt_token_count", 0) or 0) - cached_tokens
+    record["attributes"]["cached_tokens"] = cached_tokens
+    record["attributes"]["response_tokens"] = getattr(usage, "candidates_token_count", 0) or 0
+
+
+# Shared tracer used by every module of the application
+tracer = Tracer()
+
+
+def traced(name=None):
+    """
+    Decorator that records every call of a function as a span.
+
+    Args:
+        name: Span name; defaults to the function name
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,141 @@
+"""Tests for guideline context caching against the local mock backend."""
+
+import time
+
+from ai_service import AIService
+from context_cache import ContextCacheManager
+from model_backends import DEFAULT_MODEL, MockGeminiBackend, MockRateLimitError
+from pipeline import HeadlessApp
+
+
+GUIDELINE = "Patients with diabetes should have an HbA1c recorded every six months."
+
+DATA_TEXT = "DiseaseName  Medication\ndiabetes  metformin"
+
+
+class CountingBackend(MockGeminiBackend):
+    """Mock backend that counts cache calls and can fail them on demand."""
+
+    def __init__(self, fail_create=False, fail_refresh=False):
+        super().__init__()
+        self.fail_create = fail_create
+        self.fail_refresh = fail_refresh
+        self.creates = 0
+        self.refreshes = 0
+
+    def create_cached_context(self, text, model_name, ttl_seconds):
+        self.creates += 1
+        if self.fail_create:
+            raise ValueError("400 Cached content is too small (mock)")
+        return super().create_cached_context(text, model_name, ttl_seconds)
+
+    def refresh_cached_context(self, handle, ttl_seconds):
+        self.refreshes += 1
+        if self.fail_refresh:
+            raise ValueError("404 Cached content not found (mock)")
+        return super().refresh_cached_context(handle, ttl_seconds)
+
+
+class ApiError(Exception):
+    """API error carrying an HTTP status code, like the Gemini SDK errors."""
+
+    def __init__(self, code):
+        super().__init__(f"{code} (mock)")
+        self.code = code
+
+
+class FailingCachedBackend(MockGeminiBackend):
+    """Mock backend whose cached requests fail with a given error."""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+        self.prompts = []
+
+    def generate(self, prompt, model_name=DEFAULT_MODEL, cached_context=None):
+        self.prompts.append((prompt, cached_context))
+        if cached_context is not None:
+            raise self.error
+        return super().generate(prompt, model_name)
+
+
+def test_creates_once_and_reuses_handle():
+    backend = CountingBackend()
+    manager = ContextCacheManager()
+
+    first = manager.get(backend, DEFAULT_MODEL, GUIDELINE)
+    second = manager.get(backend, DEFAULT_MODEL, GUIDELINE)
+
+    assert first is second
+    assert backend.creates == 1
+    assert backend.refreshes == 0
+
+
+def test_refreshes_handle_near_expiry():
+    backend = CountingBackend()
+    manager = ContextCacheManager(ttl_seconds=60, refresh_margin=120)
+
+    first = manager.get(backend, DEFAULT_MODEL, GUIDELINE)
+    second = manager.get(backend, DEFAULT_MODEL, GUIDELINE)
+
+    assert backend.creates == 1
+    assert backend.refreshes == 1
+    assert second["name"] == first["name"]
+    assert second["expires"] >= first["expires"]
+
+
+def test_recreates_after_failed_refresh():
+    backend = CountingBackend(fail_refresh=True)
+    manager = ContextCacheManager(ttl_seconds=60, refresh_margin=120)
+
+    manager.get(backend, DEFAULT_MODEL, GUIDELINE)
+    handle = manager.get(backend, DEFAULT_MODEL, GUIDELINE)
+
+    assert handle is not None
+    assert backend.refreshes == 1
+    assert backend.creates == 2
+
+
+def test_failed_create_is_not_retried_until_ttl():
+    backend = CountingBackend(fail_create=True)
+    manager = ContextCacheManager()
+
+    assert manager.get(backend, DEFAULT_MODEL, GUIDELINE) is None
+    assert manager.get(backend, DEFAULT_MODEL, GUIDELINE) is None
+    assert backend.creates == 1
+
+    manager._failures = {key: time.time() - 1 for key in manager._failures}
+    backend.fail_create = False
+    assert manager.get(backend, DEFAULT_MODEL, GUIDELINE) is not None
+    assert backend.creates == 2
+
+
+def test_analyze_data_uses_cached_context():
+    backend = MockGeminiBackend()
+    service = AIService(HeadlessApp(), backend=backend)
+
+    for _ in range(2):
+        assert service.analyze_data("diabetes", "DiseaseName", GUIDELINE, DATA_TEXT)
+    assert len(backend._contexts) == 1
+
+
+def test_analyze_data_resends_inline_on_cache_miss():
+    for code in (404, 403):
+        backend = FailingCachedBackend(ApiError(code))
+        service = AIService(HeadlessApp(), backend=backend)
+
+        assert service.analyze_data("diabetes", "DiseaseName", GUIDELINE, DATA_TEXT)
+        (_, cached), (inline_prompt, inline_context) = backend.prompts
+        assert cached is not None
+        assert inline_context is None
+        assert GUIDELINE in inline_prompt
+
+
+def test_analyze_data_does_not_resend_on_rate_limit():
+    backend = FailingCachedBackend(MockRateLimitError())
+    app = HeadlessApp()
+    service = AIService(app, backend=backend)
+
+    assert service.analyze_data("diabetes", "DiseaseName", GUIDELINE, DATA_TEXT) is None
+    assert len(backend.prompts) == 1
+    assert any("429" in message for message in app.messages)